@@ -0,0 +1,166 @@
+"""BGM と効果音の管理
+
+音声ファイルの読み込みと再生・停止の呼び出しは、すべて専用の
+オーディオスレッドで行う。UI スレッドはキューに命令を積むだけなので、
+読み込みやデバイスの応答待ちでフレームが止まらない。
+
+効果音は同じファイルを voices 個読み込んでおき、空いている音を順に
+使う（すべて鳴っていたら一番古いものを止めて使い直す）。続けて
+鳴らしても前の音が途中で切れない。
+
+    audio = get_audio_manager()
+    audio.play('line_clear')
+    audio.play_bgm('bgm')
+"""
+import os
+import queue
+import threading
+import traceback
+
+from kivy.core.audio import SoundLoader
+
+from log import get_logger
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+# 名前 → (ファイル名, 同時に鳴らせる数, ループ再生するか)
+SOUNDS = {
+    'bgm': ('game_bgm.ogg', 1, True),
+    'line_clear': ('line_clear.wav', 4, False),
+}
+
+log = get_logger('audio')
+
+
+class AudioManager:
+    """音声の読み込みと再生を1本のスレッドにまとめる"""
+    def __init__(self, sounds=SOUNDS, asset_dir=ASSET_DIR):
+        self.sounds = dict(sounds)
+        self.asset_dir = asset_dir
+        self.voices = {}  # 名前 → 読み込んだ Sound のリスト（読み込み後にだけ追加される）
+        self._next_voice = {}  # 名前 → 次に使う voice の番号
+        self.bgm = None  # 再生中の BGM の名前
+        self._paused = []  # pause で止めた (Sound, 再生位置)
+        self.loaded = threading.Event()  # preload が終わったら立つ
+        self._commands = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='audio', daemon=True)
+        self._thread.start()
+
+    # UI スレッドから呼ぶもの（キューに積むだけで、すぐ戻る）
+    def preload(self, names=None):
+        """指定した音（省略時はすべて）を裏で読み込んでおく"""
+        self._commands.put((self._load_all, (list(names or self.sounds),)))
+
+    def play(self, name):
+        self._commands.put((self._play, (name,)))
+
+    def play_bgm(self, name='bgm'):
+        self._commands.put((self._play_bgm, (name,)))
+
+    def stop_bgm(self):
+        self._commands.put((self._stop_bgm, ()))
+
+    def pause(self):
+        """鳴っている音をすべて止め、resume で同じ位置から鳴らし直せるようにする"""
+        self._commands.put((self._pause, ()))
+
+    def resume(self):
+        self._commands.put((self._resume, ()))
+
+    def shutdown(self):
+        self._commands.put(None)
+
+    # ここから下はオーディオスレッドで動く
+    def _run(self):
+        while True:
+            command = self._commands.get()
+            if command is None:
+                break
+            func, args = command
+            try:
+                func(*args)
+            except Exception:
+                log.error('audio command %s failed\n%s', func.__name__, traceback.format_exc())
+
+    def _load_all(self, names):
+        for name in names:
+            self._load(name)
+        self.loaded.set()
+
+    def _load(self, name):
+        if name in self.voices:
+            return self.voices[name]
+        filename, count, loop = self.sounds[name]
+        path = os.path.join(self.asset_dir, filename)
+        voices = []
+        for _ in range(count):
+            sound = SoundLoader.load(path)
+            if sound is None:
+                log.warning('音声ファイルが読み込めませんでした: %s', path)
+                break
+            sound.loop = loop
+            voices.append(sound)
+        self.voices[name] = voices
+        self._next_voice[name] = 0
+        return voices
+
+    def _play(self, name):
+        voices = self._load(name)
+        if not voices:
+            return
+        # 鳴っていない voice を探し、なければ順番に使い回す
+        start = self._next_voice[name]
+        for i in range(len(voices)):
+            index = (start + i) % len(voices)
+            if voices[index].state != 'play':
+                break
+        else:
+            index = start
+            voices[index].stop()
+        self._next_voice[name] = (index + 1) % len(voices)
+        voices[index].play()
+
+    def _play_bgm(self, name):
+        if self.bgm == name:
+            return
+        self._stop_bgm()
+        voices = self._load(name)
+        if voices:
+            voices[0].play()
+            self.bgm = name
+
+    def _stop_bgm(self):
+        if self.bgm is not None:
+            voices = self.voices.get(self.bgm, ())
+            for sound in voices:
+                sound.stop()
+            # 一時停止中に止められた BGM は resume でも鳴らさない
+            self._paused = [(sound, pos) for sound, pos in self._paused if sound not in voices]
+            self.bgm = None
+
+    def _pause(self):
+        # Sound には一時停止がないので、位置を覚えて止める
+        for voices in self.voices.values():
+            for sound in voices:
+                if sound.state == 'play':
+                    self._paused.append((sound, sound.get_pos()))
+                    sound.stop()
+
+    def _resume(self):
+        paused, self._paused = self._paused, []
+        for sound, pos in paused:
+            sound.play()
+            if pos:
+                sound.seek(pos)
+
+
+_manager = None
+
+
+def get_audio_manager():
+    """アプリ全体で1つの AudioManager（初回に作って読み込みを始める）"""
+    global _manager
+    if _manager is None:
+        _manager = AudioManager()
+        _manager.preload()
+    return _manager
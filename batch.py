@@ -0,0 +1,225 @@
+"""複数ゲームをまとめて進めるバッチ環境（AI学習・バランス調整用）
+
+N 個の盤面を (N, rows) のビットマスク配列で持ち、移動・衝突判定・固定・
+ライン消去を NumPy の配列演算で全ゲーム同時に行う。
+
+engine.TetrisEngine と同じもの:
+    移動・SRS 回転・固定・ライン消去、スコア（消したライン数を足す）、
+    ミノの出現順（randomizer.py のランダマイザをゲームごとに持つので、
+    seeds[i] のシードの TetrisEngine と同じ順番で出る）
+engine.TetrisEngine と違うもの:
+    時間で進む要素はない（重力・固定猶予・レベル・ライン消去の待ち）。
+    ミノは GRAVITY と HARD_DROP でだけ落ち、落ちられなければすぐ固定する。
+"""
+import numpy as np
+
+from engine import MOVE_LEFT, MOVE_RIGHT, ROTATE_RIGHT, ROTATE_LEFT, HARD_DROP, GRAVITY
+from randomizer import Rng, make_randomizer
+from rotation import KICKS as SRS_KICKS
+from tetromino import PIECES
+
+MAX_ROWS = 4  # ミノの形状の最大行数
+NUM_KINDS = len(PIECES)
+
+# MASKS[kind, rotation, dy] = 形状 dy 行目のマスク（bit dx = dx列目）
+MASKS = np.zeros((NUM_KINDS, 4, MAX_ROWS), dtype=np.int64)
+LEFT = np.zeros((NUM_KINDS, 4), dtype=np.int64)
+RIGHT = np.zeros((NUM_KINDS, 4), dtype=np.int64)
+WIDTH = np.zeros(NUM_KINDS, dtype=np.int64)  # 出現時の形状の幅
+for _piece in PIECES:
+    WIDTH[_piece.index] = len(_piece.shapes[0][0])
+    for _rotation, (_rows, _left, _right) in enumerate(_piece.masks):
+        LEFT[_piece.index, _rotation] = _left
+        RIGHT[_piece.index, _rotation] = _right
+        for _dy, _mask in _rows:
+            MASKS[_piece.index, _rotation, _dy] = _mask
+
+# SRS の壁蹴り候補。KICKS[kind, 回転前, 0=右回転/1=左回転, k] = (dx, dy)
+# 候補が5個未満のミノ（O）は最後の候補を繰り返して埋める
+NUM_KICKS = 5
+KICKS = np.zeros((NUM_KINDS, 4, 2, NUM_KICKS, 2), dtype=np.int64)
+for _piece in PIECES:
+    for _src in range(4):
+        for _direction, _dst in enumerate(((_src + 1) % 4, (_src - 1) % 4)):
+            _kicks = SRS_KICKS[_piece.index][_src][_dst]
+            for _k in range(NUM_KICKS):
+                KICKS[_piece.index, _src, _direction, _k] = _kicks[min(_k, len(_kicks) - 1)]
+
+# 操作ごとの横移動量と回転量
+_DX = np.zeros(GRAVITY + 1, dtype=np.int64)
+_DX[MOVE_LEFT] = -1
+_DX[MOVE_RIGHT] = 1
+_DR = np.zeros(GRAVITY + 1, dtype=np.int64)
+_DR[ROTATE_RIGHT] = 1
+_DR[ROTATE_LEFT] = -1
+
+
+def _shift(masks, x):
+    """行マスクを x 列ずらす（x が負なら右シフト）"""
+    return np.where(x >= 0, masks << np.maximum(x, 0), masks >> np.maximum(-x, 0))
+
+
+class BatchTetris:
+    """N 個の独立したゲームを同時に進める環境"""
+    def __init__(self, n, cols=10, rows=20, seed=None, auto_reset=True, randomizer='bag7'):
+        if cols > 62:
+            raise ValueError('cols must fit in a 64-bit row mask')
+        self.n = n
+        self.cols = cols
+        self.rows = rows
+        self.full_row = (1 << cols) - 1
+        self.auto_reset = auto_reset  # ゲームオーバーになった盤面を自動で初期化する
+        self.randomizer = randomizer  # 'bag7' / 'history' / 'random'（TetrisEngine と同じ）
+        self.rng = np.random.default_rng(seed)  # ゲームごとのシードを決める
+        self.seeds = np.zeros(n, dtype=np.int64)  # 今のゲームのシード
+        self._randomizers = [None] * n
+        self._index = np.arange(n)
+        self.boards = np.zeros((n, rows), dtype=np.int64)
+        self.kind = np.zeros(n, dtype=np.int64)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self, mask=None):
+        """mask で選んだゲーム（省略時は全部）を初期状態に戻す"""
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.boards[mask] = 0
+        self.score[mask] = 0
+        self.lines[mask] = 0
+        self.pieces[mask] = 0
+        self.done[mask] = False
+        index = np.flatnonzero(mask)
+        self.seeds[index] = self.rng.integers(0, 1 << 32, size=index.size)
+        for i in index:
+            self._randomizers[i] = make_randomizer(self.randomizer, Rng(int(self.seeds[i])))
+        self._spawn(mask)
+
+    def _spawn(self, mask):
+        index = np.flatnonzero(mask)
+        if not index.size:
+            return
+        randomizers = self._randomizers
+        kind = np.fromiter((randomizers[i].next() for i in index), dtype=np.int64,
+                           count=index.size)
+        self.kind[mask] = kind
+        self.rotation[mask] = 0
+        self.x[mask] = self.cols // 2 - WIDTH[kind] // 2
+        self.y[mask] = 0
+
+    def collides(self, rotation, x, y, index=None):
+        """各ゲームのミノを (rotation, x, y) に置いたとき重なるか"""
+        if index is None:
+            index = self._index
+        kind = self.kind[index]
+        hit = (x + LEFT[kind, rotation] < 0) | (x + RIGHT[kind, rotation] >= self.cols)
+        rows = self.rows
+        for dy in range(MAX_ROWS):
+            mask = _shift(MASKS[kind, rotation, dy], x)
+            by = y + dy
+            present = MASKS[kind, rotation, dy] != 0
+            hit |= present & (by >= rows)
+            inside = present & (by >= 0) & (by < rows)
+            row = self.boards[index, np.clip(by, 0, rows - 1)]
+            hit |= inside & ((row & mask) != 0)
+        return hit
+
+    def step(self, actions):
+        """各ゲームに操作を1つずつ適用し、(揃ったライン数, ゲームオーバー) を返す"""
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape == ():
+            actions = np.full(self.n, actions, dtype=np.int64)
+        live = ~self.done
+        cleared = np.zeros(self.n, dtype=np.int64)
+        rotation, x, y = self.rotation, self.x, self.y
+
+        # 横移動（該当するゲームだけ判定する）
+        dx = _DX[actions]
+        index = np.flatnonzero(live & (dx != 0))
+        if index.size:
+            ok = ~self.collides(rotation[index], x[index] + dx[index], y[index], index)
+            index = index[ok]
+            x[index] += dx[index]
+
+        # 回転（補正候補を順に試す）
+        dr = _DR[actions]
+        index = np.flatnonzero(live & (dr != 0))
+        if index.size:
+            new_rotation = (rotation[index] + dr[index]) % 4
+            kicks = KICKS[self.kind[index], rotation[index], (dr[index] < 0).astype(np.int64)]
+            for k in range(NUM_KICKS):
+                kx = kicks[:, k, 0]
+                ky = kicks[:, k, 1]
+                fits = ~self.collides(new_rotation, x[index] + kx, y[index] + ky, index)
+                placed = index[fits]
+                rotation[placed] = new_rotation[fits]
+                x[placed] += kx[fits]
+                y[placed] += ky[fits]
+                index = index[~fits]
+                new_rotation = new_rotation[~fits]
+                kicks = kicks[~fits]
+                if not index.size:
+                    break
+
+        # ハードドロップ：落ちきるまでまとめて下げる
+        dropping = live & (actions == HARD_DROP)
+        index = np.flatnonzero(dropping)
+        while index.size:
+            index = index[~self.collides(rotation[index], x[index], y[index] + 1, index)]
+            y[index] += 1
+
+        # 重力：落とせるものは1マス下げ、落とせないものは固定
+        locking = dropping
+        index = np.flatnonzero(live & (actions == GRAVITY))
+        if index.size:
+            blocked = self.collides(rotation[index], x[index], y[index] + 1, index)
+            y[index[~blocked]] += 1
+            locking = dropping.copy()
+            locking[index[blocked]] = True
+        if locking.any():
+            cleared = self._lock(np.flatnonzero(locking))
+        if self.auto_reset and self.done.any():
+            self.reset(self.done.copy())
+        return cleared, self.done.copy()
+
+    def _lock(self, index):
+        kind = self.kind[index]
+        rotation = self.rotation[index]
+        x = self.x[index]
+        y = self.y[index]
+        rows = self.rows
+        full = self.full_row
+        boards = self.boards
+        for dy in range(MAX_ROWS):
+            by = y + dy
+            shifted = _shift(MASKS[kind, rotation, dy], x) & full
+            inside = (by >= 0) & (by < rows)
+            boards[index[inside], by[inside]] |= shifted[inside]
+        self.pieces[index] += 1
+
+        # ライン消去：揃った行を先頭に寄せてから 0 で埋める
+        cleared = np.zeros(self.n, dtype=np.int64)
+        is_full = boards[index] == full
+        counts = is_full.sum(axis=1)
+        if counts.any():
+            order = np.argsort(~is_full, axis=1, kind='stable')
+            compacted = np.take_along_axis(boards[index], order, axis=1)
+            compacted[np.arange(rows) < counts[:, None]] = 0
+            boards[index] = compacted
+            cleared[index] = counts
+            self.score[index] += counts
+            self.lines[index] += counts
+
+        # 新しいミノを出し、置けない・最上段まで積もったらゲームオーバー
+        mask = np.zeros(self.n, dtype=bool)
+        mask[index] = True
+        self._spawn(mask)
+        over = self.collides(self.rotation[index], self.x[index], self.y[index], index)
+        over |= boards[index, 0] != 0
+        self.done[index[over]] = True
+        return cleared
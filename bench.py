@@ -0,0 +1,285 @@
+"""エンジン・描画・入力遅延のベンチマーク
+
+最悪に近い盤面（穴だらけで天井近くまで積もった盤面、4段消し直前の盤面）で
+主要な処理の1回あたりの時間を測り、JSON のベースラインと比べる。
+描画と入力遅延はヘッドレスの Kivy ウィンドウ（SDL の offscreen）で測る。
+
+    python bench.py                  # 測って表示し、ベースラインと比較
+    python bench.py --save           # 結果をベースラインとして保存
+    python bench.py --engine-only    # Kivy を使わない項目だけ
+    python bench.py --threshold 1.5  # 中央値がベースラインの1.5倍を超えたら失敗
+
+比較は中央値で行い、閾値を超えた項目があれば終了コード 1 を返す。
+ベースラインは測ったマシンでしか意味がないのでリポジトリには入れない。
+ベースラインがないとき、または Python（メジャー.マイナー）・CPU の種類が
+違う環境で測ったものしかないときは、警告を出して終了コード 2 を返す
+（黙って合格にはしない）。その環境で --save を付けて測り直すこと。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from time import perf_counter_ns
+
+from engine import TetrisEngine
+from tetromino import PIECES_BY_NAME, ActivePiece, spawn
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+DEFAULT_THRESHOLD = 1.25  # ベースラインの中央値の何倍まで許すか
+SEED = 1234
+# ベースラインと比べてよい環境かどうかを決める項目
+PLATFORM_KEYS = ('python', 'machine', 'processor')
+NO_BASELINE = 2  # ベースラインがない・比べられないときの終了コード
+
+
+def near_full_rows(cols, rows, free=4):
+    """上 free 行だけ空けて、1行に1つずつ穴を空けた盤面"""
+    full = (1 << cols) - 1
+    cells = [0] * rows
+    for y in range(free, rows):
+        hole = (y * 7 + 3) % cols  # 穴の位置を行ごとにずらす（張り出しが多くなる）
+        cells[y] = full & ~(1 << hole)
+    return cells
+
+
+def tetris_rows(cols, rows, depth=4):
+    """下 depth 行が左端の列以外埋まった盤面（縦の I で4段消し）"""
+    full = (1 << cols) - 1
+    return [0] * (rows - depth) + [full & ~1] * depth
+
+
+def measure(op, setup=None, number=2000, repeat=5):
+    """1回あたりの時間（ナノ秒）の中央値・p95・最小
+
+    setup がなければ number 回まとめて測って割り、あれば setup の後に
+    1回ずつ測る（setup の時間は含めない）。
+    """
+    samples = []
+    if setup is None:
+        for _ in range(repeat):
+            start = perf_counter_ns()
+            for _ in range(number):
+                op()
+            samples.append((perf_counter_ns() - start) / number)
+    else:
+        for _ in range(number):
+            setup()
+            start = perf_counter_ns()
+            op()
+            samples.append(perf_counter_ns() - start)
+    samples.sort()
+    return {'median_us': round(samples[len(samples) // 2] / 1000, 3),
+            'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] / 1000, 3),
+            'min_us': round(samples[0] / 1000, 3)}
+
+
+def make_engine():
+    # ライン消去の待ちを入れず、1回の呼び出しで削除まで終わらせる
+    return TetrisEngine(seed=SEED, clear_delay=0)
+
+
+def load(engine, cells, piece=None):
+    """盤面とミノを置き直す（各計測の前準備）"""
+    engine.board.load(cells)
+    engine.rotation_cache.clear()
+    engine.clearing_lines = []
+    engine.clear_timer = 0
+    engine.is_game_over = False
+    engine.spawn_piece(piece or spawn(PIECES_BY_NAME['T'], engine.cols))
+
+
+def engine_benchmarks():
+    engine = make_engine()
+    cols, rows = engine.cols, engine.rows
+    near_full = near_full_rows(cols, rows)
+    tetris = tetris_rows(cols, rows)
+    results = {}
+
+    load(engine, near_full)
+    shape = engine.current_piece.shape
+    results['check_collision'] = measure(lambda: engine.check_collision(3, 2, shape), number=20000)
+    results['can_move'] = measure(lambda: engine.can_move(0, 1), number=20000)
+    results['can_move_rotated'] = measure(lambda: engine.can_move(0, 1, 1), number=20000)
+
+    # 天井近くまで積もった盤面に落として固定（消去なし）
+    results['hard_drop'] = measure(engine.hard_drop, setup=lambda: load(engine, near_full))
+
+    def place_low():
+        load(engine, near_full)
+        engine.current_piece.y = 1  # 着地位置に置いた状態から固定だけを測る
+
+    results['lock_piece'] = measure(engine.lock_piece, setup=place_low)
+
+    def full_tetris():
+        load(engine, tetris)
+        for y in range(rows - 4, rows):
+            engine.board.cells[y] = engine.board.full_row
+    results['clear_lines'] = measure(engine.clear_lines, setup=full_tetris)
+
+    # 縦の I を左端の穴に落として4段消し（固定・消去・次のミノまで）
+    i_piece = PIECES_BY_NAME['I']
+    results['hard_drop_tetris'] = measure(
+        engine.hard_drop,
+        setup=lambda: load(engine, tetris, ActivePiece(i_piece, 1, -2, 0)))
+
+    engine.reset(seed=SEED)
+    results['get_random_piece'] = measure(engine.get_random_piece, number=20000)
+    return results
+
+
+def kivy_benchmarks(render_modes=('rect', 'mesh')):
+    """GameBoard.draw と入力から canvas 更新までの時間"""
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')  # 画面なしで GL を使う
+    from kivy.base import EventLoop
+    from game_ui import GameBoard
+
+    EventLoop.ensure_window()
+
+    class Host:
+        # GameBoard が参照する TetrisUI の属性だけを持つ入れ物
+        audio = None
+
+        def update_score(self, score):
+            pass
+
+        def show_game_over(self):
+            pass
+
+    results = {}
+    for mode in render_modes:
+        board = GameBoard(parent_ui=Host(), render_mode=mode, seed=SEED)
+        board.engine.clear_delay = 0
+        board.size = (300, 600)
+        board.started = True
+        engine = board.engine
+        cols, rows = engine.cols, engine.rows
+        near_full = near_full_rows(cols, rows)
+        empty = [0] * rows
+        boards = [near_full, empty]
+
+        # 全マスの色が変わる最悪ケース（積もった盤面と空の盤面を交互に）
+        def swap_board():
+            boards.reverse()
+            load(engine, boards[0])
+        results[f'draw_full_{mode}'] = measure(board.draw, setup=swap_board, number=300)
+
+        # ミノが1マス動いただけの通常ケース
+        load(engine, near_full)
+        direction = [1]
+
+        def shift_piece():
+            if not engine.can_move(direction[0], 0):
+                direction[0] = -direction[0]
+            engine.current_piece.x += direction[0]
+        results[f'draw_move_{mode}'] = measure(board.draw, setup=shift_piece, number=2000)
+
+        # 入力 → エンジン → 次のフレームの描画で canvas が更新されるまで
+        def frame():
+            board.update(0)  # dt=0 なので tick は進まず、dirty な描画だけ行う
+
+        def move():
+            if not engine.can_move(direction[0], 0):
+                direction[0] = -direction[0]
+            board.move_piece(direction[0])
+            frame()
+        results[f'input_move_{mode}'] = measure(move, number=2000)
+
+        def rotate():
+            board.rotate_piece(left=False)
+            frame()
+        load(engine, empty)
+        engine.current_piece.y = 5
+        results[f'input_rotate_{mode}'] = measure(rotate, number=2000)
+        board.stop_update()
+    return results
+
+
+def platform_info():
+    # パッチ版やホスト名の違いでは速さはほぼ変わらないので比べない
+    return {'python': '.'.join(platform.python_version_tuple()[:2]),
+            'machine': platform.machine(), 'processor': platform.processor()}
+
+
+def platform_mismatch(saved, current):
+    """ベースラインと今の環境で違う項目の (名前, 保存時, 今) のリスト"""
+    return [(key, saved.get(key), current[key]) for key in PLATFORM_KEYS
+            if saved.get(key) != current[key]]
+
+
+def compare(results, baseline, threshold):
+    """(名前, 今回, 基準, 比率, 退行か) のリスト"""
+    rows = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            rows.append((name, stats['median_us'], None, None, False))
+            continue
+        ratio = stats['median_us'] / max(base['median_us'], 1e-9)
+        rows.append((name, stats['median_us'], base['median_us'], ratio, ratio > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--save', action='store_true', help='結果をベースラインとして保存する')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=None,
+                        help=f'許容する中央値の倍率（既定はベースラインの値か {DEFAULT_THRESHOLD}）')
+    parser.add_argument('--engine-only', action='store_true', help='Kivy を使う項目を省く')
+    parser.add_argument('--json', help='今回の結果を書き出すパス')
+    args = parser.parse_args(argv)
+
+    results = engine_benchmarks()
+    if not args.engine_only:
+        results.update(kivy_benchmarks())
+
+    current = platform_info()
+    data = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            data = json.load(f)
+    baseline = data.get('results', {}) if data else {}
+    saved_threshold = data.get('threshold') if data else None
+    threshold = args.threshold or saved_threshold or DEFAULT_THRESHOLD
+    mismatch = platform_mismatch(data, current) if data else []
+
+    regressions = 0
+    for name, now, base, ratio, regressed in compare(results, baseline, threshold):
+        if base is None:
+            print(f'{name:<22} {now:>10.3f} us')
+            continue
+        mark = '  REGRESSION' if regressed else ''
+        print(f'{name:<22} {now:>10.3f} us  (base {base:.3f} us, x{ratio:.2f}){mark}')
+        regressions += regressed
+
+    report = dict(current, threshold=threshold, results=results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'saved baseline to {args.baseline}')
+        return 0
+    if data is None:
+        print(f'WARNING: no baseline at {args.baseline}; nothing was compared. '
+              'Run with --save on this machine to record one.', file=sys.stderr)
+        return NO_BASELINE
+    if mismatch:
+        # 別の環境で測った値と比べても退行かどうか判断できない
+        for key, saved, now in mismatch:
+            print(f'WARNING: baseline {key} differs: {saved!r} (baseline) != {now!r}',
+                  file=sys.stderr)
+        print('WARNING: the baseline was recorded in another environment, so the results '
+              'above were not checked. Run with --save to record one for this machine.',
+              file=sys.stderr)
+        return NO_BASELINE
+    if regressions:
+        print(f'{regressions} benchmark(s) slower than x{threshold} of the baseline')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
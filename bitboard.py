@@ -0,0 +1,147 @@
+"""ビットボード方式の盤面エンジン（Kivyに依存しない）
+
+各行を整数のビットマスク（bit x = x列目）で持ち、ミノは回転ごとの
+行マスクとして扱う。衝突判定は AND、固定は OR、ライン判定は
+満杯マスクとの比較だけで済む。
+"""
+
+
+def shape_to_masks(shape):
+    """形状（2次元リスト）を (行マスク, 左端列, 右端列) に変換する
+
+    行マスクは (dy, mask) のタプルで、空行は含めない。
+    """
+    rows = []
+    left = None
+    right = None
+    for dy, row in enumerate(shape):
+        mask = 0
+        for dx, cell in enumerate(row):
+            if cell:
+                mask |= 1 << dx
+                if left is None or dx < left:
+                    left = dx
+                if right is None or dx > right:
+                    right = dx
+        if mask:
+            rows.append((dy, mask))
+    return tuple(rows), left, right
+
+
+class BitBoard:
+    """行ごとのビットマスクで表した盤面"""
+    def __init__(self, cols=10, rows=20):
+        self.cols = cols
+        self.rows = rows
+        self.full_row = (1 << cols) - 1  # 1行すべて埋まった状態のマスク
+        self.cells = [0] * rows  # cells[y] が y 行目のマスク（0 = 最上段）
+        # 列ごとの高さ（一番上のブロックから床まで。空の列は 0）
+        self.heights = [0] * cols
+        # 前回の描画以降に変化した行（描画側が take_dirty_rows で受け取る）
+        self.dirty_rows = set(range(rows))
+
+    def reset(self):
+        self.cells = [0] * self.rows
+        self.heights = [0] * self.cols
+        self.dirty_rows.update(range(self.rows))
+
+    def take_dirty_rows(self):
+        dirty = self.dirty_rows
+        self.dirty_rows = set()
+        return dirty
+
+    def is_filled(self, x, y):
+        return (self.cells[y] >> x) & 1
+
+    def collides(self, masks, left, right, x, y):
+        """masks を (x, y) に置いたとき壁・床・ブロックと重なるか"""
+        # 左右の壁は端の列だけで判定できる
+        if x + left < 0 or x + right >= self.cols:
+            return True
+        cells = self.cells
+        rows = self.rows
+        for dy, mask in masks:
+            by = y + dy
+            if by >= rows:
+                return True
+            if by >= 0:
+                if cells[by] & (mask << x if x >= 0 else mask >> -x):
+                    return True
+        return False
+
+    def lock(self, masks, x, y):
+        """ミノを盤面に固定する（盤面外のセルは捨てる）"""
+        cells = self.cells
+        heights = self.heights
+        full = self.full_row
+        for dy, mask in masks:
+            by = y + dy
+            if 0 <= by < self.rows:
+                row = (mask << x if x >= 0 else mask >> -x) & full
+                cells[by] |= row
+                self.dirty_rows.add(by)
+                # 置いたセルの列だけ高さを更新する
+                height = self.rows - by
+                while row:
+                    bit = row & -row
+                    col = bit.bit_length() - 1
+                    if heights[col] < height:
+                        heights[col] = height
+                    row ^= bit
+
+    def load(self, cells):
+        """行マスクのリストで盤面を丸ごと置き換える（ベンチマーク・復元用）"""
+        self.cells = list(cells)
+        self.dirty_rows.update(range(self.rows))
+        self._recompute_heights()
+
+    def full_lines(self):
+        full = self.full_row
+        return [y for y, row in enumerate(self.cells) if row == full]
+
+    def remove_lines(self, lines):
+        """指定した行を消して上に空行を詰める"""
+        if not lines:
+            return
+        drop = set(lines)
+        kept = [row for y, row in enumerate(self.cells) if y not in drop]
+        self.cells = [0] * (self.rows - len(kept)) + kept
+        # 一番下の消去行より上はすべてずれる
+        self.dirty_rows.update(range(max(lines) + 1))
+        self._recompute_heights()
+
+    def _recompute_heights(self):
+        # ライン消去後は穴があるので上から走査し直す（消去時だけ）
+        heights = [0] * self.cols
+        remaining = self.full_row
+        for y, row in enumerate(self.cells):
+            found = row & remaining
+            while found:
+                bit = found & -found
+                heights[bit.bit_length() - 1] = self.rows - y
+                found ^= bit
+            remaining &= ~row
+            if not remaining:
+                break
+        self.heights = heights
+
+    def drop_distance(self, bottoms, x, y):
+        """列の高さから、ミノが何マス落ちられるかを求める
+
+        bottoms はミノの列ごとの最下段セル (dx, dy)。ミノがどこかの列で
+        積み上がりより下（張り出しの下）にいる場合は None を返す。
+        """
+        rows = self.rows
+        heights = self.heights
+        distance = rows
+        for dx, dy in bottoms:
+            surface = rows - heights[x + dx]  # その列で最初にブロックがある行
+            gap = surface - 1 - (y + dy)
+            if gap < 0:
+                return None
+            if gap < distance:
+                distance = gap
+        return distance
+
+    def row_has_blocks(self, y):
+        return self.cells[y] != 0
@@ -0,0 +1,291 @@
+"""自動でテトリスを遊ぶボット（Kivyに依存しない）
+
+今のミノが回転・左右移動・ハードドロップで置ける (回転, 列) をすべて
+列挙し、高さの合計・穴・凸凹・消えるライン数で評価して一番良い位置を
+選ぶ。上位 beam 個の候補については次のミノの置き方まで読む。
+
+盤面はコピーせず、候補を置くときは BitBoard の行マスクと列の高さを
+その場で書き換え、評価が済んだら元に戻す。穴の数・高さの合計・凸凹は
+置く前の値を1回だけ求めておき、候補ごとにはミノが掛かる列の差分だけを
+計算する。次のミノまで読むとき、候補で行が揃う場合だけは揃った行を
+消した行リストを作り、その盤面で次のミノを評価する。
+
+    bot = Bot(engine)
+    while not engine.is_game_over:
+        engine.step(bot.next_action())
+"""
+import sys
+from time import perf_counter
+
+from engine import TetrisEngine, MOVE_LEFT, MOVE_RIGHT, ROTATE_LEFT, ROTATE_RIGHT, HARD_DROP
+from rotation import rotate
+from tetromino import PIECES, spawn
+
+# 評価の重み（高さの合計・消えるライン・穴・凸凹）
+DEFAULT_WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+
+def _column_tops(piece):
+    # 回転ごとに、列ごとの最上段セル (dx, dy)
+    result = []
+    for cells in piece.cells:
+        highest = {}
+        for dx, dy in cells:
+            highest[dx] = min(highest.get(dx, dy), dy)
+        result.append(tuple(sorted(highest.items())))
+    return tuple(result)
+
+
+def _footprints(piece):
+    # 回転ごとに (左上に詰めた行マスク, 左端列, 最上段)。
+    # O の全回転や I・S・Z の 0/2 と 1/3 は詰めると同じ形になり、置いた結果が重なる
+    result = []
+    for rows, left, _ in piece.masks:
+        top = rows[0][0]
+        result.append((tuple((dy - top, mask >> left) for dy, mask in rows), left, top))
+    return tuple(result)
+
+
+TOPS = tuple(_column_tops(piece) for piece in PIECES)
+FOOTPRINTS = tuple(_footprints(piece) for piece in PIECES)
+# 0 の向きから各回転状態にするための回転（右回転の回数、左なら -1）
+ROTATION_PATHS = ((), (False,), (False, False), (True,))
+
+
+def board_features(board):
+    """(高さの合計, 穴の数, 凸凹) を盤面全体から求める"""
+    heights = board.heights
+    covered = 0
+    holes = 0
+    for row in board.cells:
+        empty_under = covered & ~row  # 上にブロックがある空きマス
+        holes += bin(empty_under).count('1')
+        covered |= row
+    bump = sum(abs(heights[i] - heights[i + 1]) for i in range(len(heights) - 1))
+    return sum(heights), holes, bump
+
+
+class Bot:
+    """置き場所を探索して操作を1つずつ返すボット"""
+    def __init__(self, engine, weights=DEFAULT_WEIGHTS, lookahead=True, beam=3):
+        self.engine = engine
+        self.weights = weights
+        self.lookahead = lookahead  # 次のミノまで読むか
+        self.beam = beam  # 次のミノまで読む候補の数
+        self.target = None  # (回転, x)
+        self._planned_piece = None
+        self.evaluations = 0  # 評価した置き方の数（計測用）
+        self.last_plan_time = 0.0
+
+    def placements(self, kind):
+        """今の盤面で kind を出現位置から置ける (回転, x, 着地y) を列挙する"""
+        engine = self.engine
+        board = engine.board
+        start = spawn(kind, engine.cols)
+        collides = board.collides
+        footprints = FOOTPRINTS[kind.index]
+        seen = set()  # 盤面に置いたセルが同じ置き方は1回だけ評価する
+        result = []
+        for rotation, path in enumerate(ROTATION_PATHS):
+            rot, x, y = 0, start.x, start.y
+            if collides(*kind.masks[0], x, y):
+                return result
+            for left in path:
+                turned = rotate(board, kind, rot, x, y, left)
+                if turned is None:
+                    break
+                rot, x, y = turned
+            else:
+                masks = kind.masks[rotation]
+                bottoms = kind.bottoms[rotation]
+                shape, offset, top = footprints[rotation]
+                # 左右に動ける範囲をすべて候補にする
+                for step in (-1, 1):
+                    nx = x if step < 0 else x + 1
+                    while not collides(*masks, nx, y):
+                        distance = board.drop_distance(bottoms, nx, y)
+                        if distance is None:
+                            distance = 0
+                            while not collides(*masks, nx, y + distance + 1):
+                                distance += 1
+                        # 盤面の上にはみ出して止まる置き方はゲームオーバーなので候補にしない
+                        key = (shape, nx + offset, y + distance + top)
+                        if y + distance + top >= 0 and key not in seen:
+                            seen.add(key)
+                            result.append((rotation, nx, y + distance))
+                        nx += step
+        return result
+
+    def _place(self, kind, rotation, x, y, base):
+        """盤面に置いて評価値の材料を求め、(特徴, 元に戻す情報) を返す
+
+        base は置く前の (高さの合計, 穴, 凸凹)。盤面と高さは書き換えたまま返す。
+        """
+        board = self.engine.board
+        cells = board.cells
+        heights = board.heights
+        rows = board.rows
+        full = board.full_row
+        saved_rows = []
+        lines = 0
+        for dy, mask in kind.masks[rotation][0]:
+            row_y = y + dy
+            shifted = mask << x if x >= 0 else mask >> -x
+            saved_rows.append((row_y, cells[row_y]))
+            cells[row_y] |= shifted
+            if cells[row_y] == full:
+                lines += 1
+
+        aggregate, holes, bump = base
+        saved_heights = []
+        cols = len(heights)
+        lo = hi = None
+        for (dx, top), (_, bottom) in zip(TOPS[kind.index][rotation], kind.bottoms[rotation]):
+            column = x + dx
+            old = heights[column]
+            # ミノの下に残る空きマスが新しい穴になる
+            gap = (rows - old) - (y + bottom) - 1
+            if gap > 0:
+                holes += gap
+            new = max(old, rows - (y + top))
+            saved_heights.append((column, old))
+            if new != old:
+                heights[column] = new
+                aggregate += new - old
+            if lo is None or column < lo:
+                lo = column
+            if hi is None or column > hi:
+                hi = column
+        # 凸凹はミノが掛かった列とその両隣の差だけ計算し直す
+        for i in range(max(lo - 1, 0), min(hi + 1, cols - 1)):
+            new_diff = abs(heights[i] - heights[i + 1])
+            old_i = old_next = None
+            for column, old in saved_heights:
+                if column == i:
+                    old_i = old
+                elif column == i + 1:
+                    old_next = old
+            old_diff = abs((heights[i] if old_i is None else old_i)
+                           - (heights[i + 1] if old_next is None else old_next))
+            bump += new_diff - old_diff
+        # 消えるラインのぶん全体が下がるとみなす
+        aggregate = max(aggregate - lines * cols, 0)
+        self.evaluations += 1
+        return (aggregate, holes, bump, lines), (saved_rows, saved_heights)
+
+    def _undo(self, saved):
+        board = self.engine.board
+        saved_rows, saved_heights = saved
+        for row_y, row in saved_rows:
+            board.cells[row_y] = row
+        for column, old in saved_heights:
+            board.heights[column] = old
+
+    def _score(self, features, lines):
+        w_height, w_lines, w_holes, w_bump = self.weights
+        aggregate, holes, bump, _ = features
+        return w_height * aggregate + w_lines * lines + w_holes * holes + w_bump * bump
+
+    def choose(self):
+        """今のミノの最善の (回転, x, 評価値)。置けなければ None"""
+        start = perf_counter()
+        engine = self.engine
+        kind = engine.current_piece.kind
+        base = board_features(engine.board)
+        scored = []
+        for rotation, x, y in self.placements(kind):
+            features, saved = self._place(kind, rotation, x, y, base)
+            scored.append((self._score(features, features[3]), rotation, x, y, features))
+            self._undo(saved)
+        if not scored:
+            return None
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best = scored[0]
+        if self.lookahead:
+            following = engine.next_pieces(1)
+            if following:
+                best = self._lookahead(scored[:self.beam], following[0]) or best
+        self.last_plan_time = perf_counter() - start
+        return best[1], best[2], best[0]
+
+    def _lookahead(self, candidates, next_kind):
+        # 候補を置いたまま次のミノの置き方を調べ、2手後の盤面で比べ直す
+        board = self.engine.board
+        best = None
+        for _, rotation, x, y, features in candidates:
+            kind = self.engine.current_piece.kind
+            _, saved = self._place(kind, rotation, x, y, (0, 0, 0))
+            cleared = features[3]
+            if cleared:
+                # 揃った行を消した盤面で次のミノを調べる（元の行と高さは後で戻す）
+                cells, heights = board.cells, board.heights
+                kept = [row for row in cells if row != board.full_row]
+                board.cells = [0] * (board.rows - len(kept)) + kept
+                board._recompute_heights()
+                base = board_features(board)
+            else:
+                base = features[:3]
+            second = None
+            for rotation2, x2, y2 in self.placements(next_kind):
+                features2, saved2 = self._place(next_kind, rotation2, x2, y2, base)
+                score = self._score(features2, cleared + features2[3])
+                self._undo(saved2)
+                if second is None or score > second:
+                    second = score
+            if cleared:
+                board.cells, board.heights = cells, heights
+            self._undo(saved)
+            if second is None:
+                continue  # 次のミノが置けない＝ゲームオーバーになる置き方
+            if best is None or second > best[0]:
+                best = (second, rotation, x, y, features)
+        return best
+
+    def next_action(self):
+        """今のミノを目標の位置へ運ぶための次の操作"""
+        engine = self.engine
+        piece = engine.current_piece
+        if piece is not self._planned_piece:
+            self._planned_piece = piece
+            plan = self.choose()
+            self.target = plan[:2] if plan else None
+        if self.target is None:
+            return HARD_DROP
+        rotation, x = self.target
+        if piece.rotation != rotation:
+            # 3回右に回すより1回左に回す
+            return ROTATE_LEFT if (rotation - piece.rotation) % 4 == 3 else ROTATE_RIGHT
+        if piece.x < x and engine.can_move(1, 0):
+            return MOVE_RIGHT
+        if piece.x > x and engine.can_move(-1, 0):
+            return MOVE_LEFT
+        return HARD_DROP
+
+
+def play(engine, bot=None, max_pieces=None):
+    """描画なしでゲームオーバー（または max_pieces 個）まで遊ばせる"""
+    bot = bot or Bot(engine)
+    while not engine.is_game_over:
+        if max_pieces is not None and engine.pieces >= max_pieces:
+            break
+        engine.step(bot.next_action())
+        engine.tick()
+    return engine
+
+
+def main(argv):
+    pieces = int(argv[1]) if len(argv) > 1 else 1000
+    seed = int(argv[2]) if len(argv) > 2 else 1
+    engine = TetrisEngine(seed=seed, clear_delay=0)
+    bot = Bot(engine)
+    start = perf_counter()
+    play(engine, bot, pieces)
+    elapsed = perf_counter() - start
+    print(f'pieces={engine.pieces} lines={engine.lines} game_over={engine.is_game_over}')
+    print(f'{elapsed / max(engine.pieces, 1) * 1000:.2f} ms/piece, '
+          f'{bot.evaluations / max(engine.pieces, 1):.0f} evaluations/piece')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
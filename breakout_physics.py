@@ -0,0 +1,179 @@
+"""ブロック崩しの当たり判定（Kivyに依存しない）
+
+ブロックは一様グリッドのセルに登録しておき、ボールが通った範囲
+（移動前後を囲む矩形）に重なるセルだけを調べる。ブロックが何百個に
+増えても、1フレームで見るのはボール周辺の数セル分だけになる。
+"""
+
+# create_blocks の並び（横80px・縦25px間隔）に合わせたセルの大きさ
+CELL_WIDTH = 80
+CELL_HEIGHT = 25
+
+
+class BrickGrid:
+    """(セルx, セルy) をキーにブロックを引ける一様グリッド"""
+    def __init__(self, origin_x=0, origin_y=0, cell_width=CELL_WIDTH, cell_height=CELL_HEIGHT):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.cells = {}  # (cx, cy) → そのセルに掛かっているブロックのリスト
+        self.rects = {}  # ブロック → (x, y, 幅, 高さ)
+        self._keys = {}  # ブロック → 登録したセルのキー
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __iter__(self):
+        return iter(self.rects)
+
+    def clear(self):
+        self.cells.clear()
+        self.rects.clear()
+        self._keys.clear()
+
+    def cell_range(self, x0, y0, x1, y1):
+        """矩形が重なるセルの範囲 (cx0, cy0, cx1, cy1)（両端を含む）"""
+        ox, oy = self.origin_x, self.origin_y
+        cw, ch = self.cell_width, self.cell_height
+        return (int((x0 - ox) // cw), int((y0 - oy) // ch),
+                int((x1 - ox) // cw), int((y1 - oy) // ch))
+
+    def add(self, brick, x, y, width, height):
+        cx0, cy0, cx1, cy1 = self.cell_range(x, y, x + width, y + height)
+        keys = [(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)]
+        for key in keys:
+            self.cells.setdefault(key, []).append(brick)
+        self.rects[brick] = (x, y, width, height)
+        self._keys[brick] = keys
+
+    def remove(self, brick):
+        for key in self._keys.pop(brick, ()):
+            bucket = self.cells[key]
+            bucket.remove(brick)
+            if not bucket:
+                del self.cells[key]
+        self.rects.pop(brick, None)
+
+    def query(self, x0, y0, x1, y1):
+        """矩形に重なるセルにいるブロック（重複なし）"""
+        cx0, cy0, cx1, cy1 = self.cell_range(x0, y0, x1, y1)
+        cells = self.cells
+        found = []
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for brick in bucket:
+                        if brick not in found:
+                            found.append(brick)
+        return found
+
+    def hits(self, x0, y0, x1, y1):
+        """矩形と実際に重なっているブロック"""
+        rects = self.rects
+        result = []
+        for brick in self.query(x0, y0, x1, y1):
+            bx, by, bw, bh = rects[brick]
+            if x0 < bx + bw and bx < x1 and y0 < by + bh and by < y1:
+                result.append(brick)
+        return result
+
+
+def swept_aabb(x0, y0, x1, y1, width, height):
+    """(x0, y0) から (x1, y1) へ動く width x height の矩形が通る範囲"""
+    return (min(x0, x1), min(y0, y1), max(x0, x1) + width, max(y0, y1) + height)
+
+
+def sweep(x, y, width, height, dx, dy, rect):
+    """(x, y, width, height) の矩形が (dx, dy) 動く間に静止矩形 rect に当たるか
+
+    当たるなら (時刻 t（0〜1）, 法線x, 法線y)、当たらなければ None。
+    rect を移動する矩形の大きさだけ広げ、中心の点の線分との交差として解く。
+    角にちょうど当たったときは法線が両方向を向く。
+    """
+    rx, ry, rw, rh = rect
+    left, right = rx - width, rx + rw
+    bottom, top = ry - height, ry + rh
+    if dx:
+        t1 = (left - x) / dx
+        t2 = (right - x) / dx
+        tx_entry, tx_exit = (t1, t2) if t1 < t2 else (t2, t1)
+    elif left < x < right:
+        tx_entry, tx_exit = float('-inf'), float('inf')
+    else:
+        return None
+    if dy:
+        t1 = (bottom - y) / dy
+        t2 = (top - y) / dy
+        ty_entry, ty_exit = (t1, t2) if t1 < t2 else (t2, t1)
+    elif bottom < y < top:
+        ty_entry, ty_exit = float('-inf'), float('inf')
+    else:
+        return None
+    entry = max(tx_entry, ty_entry)
+    if entry > min(tx_exit, ty_exit) or entry < 0 or entry > 1:
+        return None  # 当たらない（始めから重なっている場合も無視する）
+    nx = ny = 0
+    if tx_entry >= ty_entry:
+        nx = -1 if dx > 0 else 1
+    if ty_entry >= tx_entry:
+        ny = -1 if dy > 0 else 1
+    return entry, nx, ny
+
+
+def move_ball(x, y, width, height, vx, vy, bounds, paddle=None, grid=None, max_hits=8):
+    """ボールを1フレーム分、連続的な当たり判定付きで動かす
+
+    bounds は (幅, 高さ) で、左・右・上の壁で跳ね返る（下は抜ける）。
+    paddle は (x, y, 幅, 高さ)、grid は BrickGrid。移動経路上で最初に
+    当たったものから順に、面の法線で速度を反射させて残りの距離を進む。
+    1フレームに max_hits 回まで処理し、当たったブロックは grid から外す。
+    戻り値は (x, y, vx, vy, 当たったブロックのリスト)。
+    """
+    area_width, area_height = bounds
+    hits = []
+    remaining = 1.0
+    for _ in range(max_hits):
+        dx = vx * remaining
+        dy = vy * remaining
+        best = None  # (t, 法線x, 法線y, 相手)
+        # 壁（すでに外へはみ出していたら t=0 で押し返す）
+        if dx < 0 and x + dx < 0:
+            best = (max(0.0, -x / dx), 1, 0, None)
+        elif dx > 0 and x + dx + width > area_width:
+            best = (max(0.0, (area_width - width - x) / dx), -1, 0, None)
+        if dy > 0 and y + dy + height > area_height:
+            t = max(0.0, (area_height - height - y) / dy)
+            if best is None or t < best[0]:
+                best = (t, 0, -1, None)
+            elif t == best[0]:
+                best = (t, best[1], -1, None)
+        if paddle is not None:
+            hit = sweep(x, y, width, height, dx, dy, paddle)
+            if hit and (best is None or hit[0] < best[0]):
+                best = hit + (None,)
+        if grid is not None:
+            rects = grid.rects
+            for brick in grid.query(*swept_aabb(x, y, x + dx, y + dy, width, height)):
+                hit = sweep(x, y, width, height, dx, dy, rects[brick])
+                if hit and (best is None or hit[0] < best[0]):
+                    best = hit + (brick,)
+        if best is None:
+            x += dx
+            y += dy
+            break
+        t, nx, ny, brick = best
+        x += dx * t
+        y += dy * t
+        if nx:
+            vx = abs(vx) * nx
+        if ny:
+            vy = abs(vy) * ny
+        remaining *= 1.0 - t
+        if brick is not None:
+            grid.remove(brick)
+            hits.append(brick)
+        if remaining <= 0:
+            break
+    return x, y, vx, vy, hits
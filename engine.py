@@ -0,0 +1,276 @@
+"""ゲームのルール本体（Kivyに依存しない）
+
+盤面・ミノの生成・落下・固定・ライン消去・スコアをまとめて持つ。
+画面側（teto.GameBoard）はこのクラスを操作して結果を描くだけにする。
+"""
+import random
+
+from bitboard import BitBoard, shape_to_masks
+from randomizer import Rng, PieceQueue, make_randomizer
+from rotation import rotate
+from tetromino import PIECES, spawn
+
+# step() に渡す操作
+NONE = 0
+MOVE_LEFT = 1
+MOVE_RIGHT = 2
+ROTATE_RIGHT = 3
+ROTATE_LEFT = 4
+HARD_DROP = 5
+GRAVITY = 6  # 1マス落とす（落とせなければ固定）
+
+TICK_RATE = 60  # 1秒あたりのロジック更新回数
+
+# 重力の単位：G = 1tickに1マス落下。内部では 1/G マス単位で落下量を貯める
+G = 65536
+# レベルごとの「1マス落ちるのに必要なtick数」（小数は1tickに複数マス、1/20 = 20G）
+GRAVITY_TABLE_TICKS = (30, 26, 22, 18, 15, 12, 9, 7, 5, 4, 3, 2, 1, 1 / 2, 1 / 5, 1 / 20)
+GRAVITY_TABLE = tuple(-(-G // ticks) if ticks >= 1 else int(G / ticks)
+                      for ticks in GRAVITY_TABLE_TICKS)
+LINES_PER_LEVEL = 10  # 何ライン消すとレベルが上がるか
+LOCK_DELAY_TICKS = 30  # 接地してから固定されるまでのtick数
+MOVE_RESET_LIMIT = 15  # 接地中の移動・回転で固定猶予をリセットできる回数
+CLEAR_DELAY_TICKS = 30  # ライン消去のハイライトを見せるtick数
+QUEUE_SIZE = 5  # 先読みしておく次のミノの数
+
+
+class TetrisEngine:
+    """テトリスのルールを管理するクラス"""
+    def __init__(self, cols=10, rows=20, seed=None, start_level=0,
+                 lock_delay=LOCK_DELAY_TICKS, move_reset_limit=MOVE_RESET_LIMIT,
+                 clear_delay=CLEAR_DELAY_TICKS, randomizer='bag7'):
+        self.cols = cols
+        self.rows = rows
+        self.randomizer = randomizer  # 'bag7' / 'history' / 'random'
+        self.start_level = start_level
+        self.lock_delay = lock_delay
+        self.move_reset_limit = move_reset_limit
+        self.clear_delay = clear_delay  # 0 ならライン消去を待たずに確定する
+        self.board = BitBoard(cols, rows)
+        self.rng = Rng()
+        self._next_seed = seed  # 最初のゲームだけ指定のシードを使う
+        self.recorder = None  # リプレイ記録先（replay.ReplayRecorder）
+        # イベント通知（画面側が必要なら設定する）
+        self.on_lines_cleared = None  # (engine, lines) で呼ばれる
+        self.on_game_over = None  # (engine) で呼ばれる
+        self._actions = {
+            NONE: lambda: None,
+            MOVE_LEFT: lambda: self.move_piece(-1),
+            MOVE_RIGHT: lambda: self.move_piece(1),
+            ROTATE_RIGHT: lambda: self.rotate_piece(left=False),
+            ROTATE_LEFT: lambda: self.rotate_piece(left=True),
+            HARD_DROP: self.hard_drop,
+            GRAVITY: self.gravity_step,
+        }
+        self.reset()
+
+    def reset(self, seed=None):
+        """新しいゲームを始める。シード省略時は毎回ランダムに決める"""
+        if seed is None:
+            seed = self._next_seed
+            if seed is None:
+                seed = random.getrandbits(32)
+        self._next_seed = None
+        self.seed = seed  # リプレイで同じミノ順を再現するために覚えておく
+        self.rng.seed(seed)
+        self.queue = PieceQueue(make_randomizer(self.randomizer, self.rng), QUEUE_SIZE)
+        self.ticks = 0  # ゲーム開始からのtick数
+        self.board.reset()
+        self.rotation_cache = {}  # (ミノ, 回転, x, y, 左回転か) → 回転結果
+        self.clearing_lines = []  # 揃って削除待ちの行番号
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0  # 固定したミノの数
+        self.is_game_over = False
+        self.level = self.start_level
+        self.gravity = GRAVITY_TABLE[min(self.level, len(GRAVITY_TABLE) - 1)]
+        self.gravity_units = 0  # 貯まった落下量（G で1マス）
+        self.clear_timer = 0  # ライン消去の残りtick数
+        self.spawn_piece(self.get_random_piece())
+
+    def spawn_piece(self, piece):
+        self.current_piece = piece
+        self.lock_counter = 0  # 接地してからのtick数
+        self.lock_resets = 0  # 固定猶予をリセットした回数
+        self.lowest_y = piece.y  # このミノが到達した最も低い行
+
+    def get_random_piece(self):
+        return spawn(PIECES[self.queue.pop()], self.cols)
+
+    def next_pieces(self, count=QUEUE_SIZE):
+        """次に出るミノの種類（PieceType）を先頭から count 個"""
+        return [PIECES[index] for index in self.queue.peek(count)]
+
+    def step(self, action):
+        """操作を1つ適用し、その操作で揃ったライン数を返す"""
+        if self.is_game_over:
+            return 0
+        if self.recorder is not None:
+            self.recorder.record(self.ticks, action)
+        lines = self.lines
+        self._actions[action]()
+        return self.lines - lines
+
+    def tick(self):
+        """固定タイムステップで1tick進める。見た目が変わったら True"""
+        if self.is_game_over:
+            return False
+        self.ticks += 1
+
+        # ライン消去のハイライト中は落下を止めて待つ
+        if self.clear_timer:
+            self.clear_timer -= 1
+            if self.clear_timer:
+                return False
+            self.finish_clear_lines()
+            return True
+
+        piece = self.current_piece
+        moved = False
+        self.gravity_units += self.gravity
+        while self.gravity_units >= G:
+            self.gravity_units -= G
+            if not self.can_move(0, 1):
+                self.gravity_units = 0
+                break
+            piece.y += 1
+            moved = True
+        if piece.y > self.lowest_y:
+            # 新しい行まで落ちたらリセット回数を戻す
+            self.lowest_y = piece.y
+            self.lock_resets = 0
+
+        # 接地中は固定までの猶予を数える
+        if self.can_move(0, 1):
+            self.lock_counter = 0
+        else:
+            self.lock_counter += 1
+            if self.lock_counter >= self.lock_delay:
+                self.lock_piece()
+                return True
+        return moved
+
+    def _reset_lock_delay(self):
+        # 接地中に動かしたら、回数制限の範囲で固定までの猶予を戻す
+        if self.lock_counter and self.lock_resets < self.move_reset_limit:
+            self.lock_counter = 0
+            self.lock_resets += 1
+
+    def check_collision(self, x, y, shape):
+        masks, left, right = shape_to_masks(shape)
+        return self.board.collides(masks, left, right, x, y)
+
+    def can_move(self, dx, dy, rotation_offset=0):
+        piece = self.current_piece
+        new_rotation = (piece.rotation + rotation_offset) % len(piece.kind.shapes)
+        masks, left, right = piece.kind.masks[new_rotation]
+        return not self.board.collides(masks, left, right, piece.x + dx, piece.y + dy)
+
+    def move_piece(self, dx):
+        if self.can_move(dx, 0):
+            self.current_piece.x += dx
+            self._reset_lock_delay()
+            return True
+        return False
+
+    def rotate_piece(self, left=False):
+        """SRS の壁蹴り付きで回転する"""
+        piece = self.current_piece
+        # 盤面が変わらない間（固定まで）は同じ位置からの回転結果を使い回す
+        key = (piece.kind.index, piece.rotation, piece.x, piece.y, left)
+        cache = self.rotation_cache
+        if key in cache:
+            result = cache[key]
+        else:
+            result = cache[key] = rotate(self.board, piece.kind, piece.rotation,
+                                         piece.x, piece.y, left)
+        if result is None:
+            return False
+        piece.rotation, piece.x, piece.y = result
+        self._reset_lock_delay()
+        return True
+
+    def gravity_step(self):
+        """1マス落とす。ライン消去待ちなら消去を確定させる"""
+        if self.clearing_lines:
+            self.finish_clear_lines()
+            return
+        if self.can_move(0, 1):
+            self.current_piece.y += 1
+        else:
+            # 動かせないので固定する
+            self.lock_piece()
+
+    def drop_distance(self):
+        """今のミノが何マス下まで落ちられるか（O(ミノの幅)）"""
+        piece = self.current_piece
+        distance = self.board.drop_distance(piece.bottoms, piece.x, piece.y)
+        if distance is None:
+            # 張り出しの下に潜り込んでいるときだけ1マスずつ調べる
+            distance = 0
+            while self.can_move(0, distance + 1):
+                distance += 1
+        return distance
+
+    def ghost_y(self):
+        """ゴースト（着地予定位置）の y 座標"""
+        return self.current_piece.y + self.drop_distance()
+
+    def hard_drop(self):
+        self.current_piece.y += self.drop_distance()
+        self.lock_piece()
+
+    def lock_piece(self):
+        piece = self.current_piece
+        masks, _, _ = piece.masks
+
+        # 現在のピースをボードに固定
+        self.board.lock(masks, piece.x, piece.y)
+        self.rotation_cache.clear()
+        self.pieces += 1
+
+        # ラインが揃っていれば消す
+        self.clear_lines()
+
+        # 新しいピースを出す
+        self.spawn_piece(self.get_random_piece())
+
+        # 新しいピースが置けない、または最上段まで積もったらゲームオーバー
+        if not self.can_move(0, 0) or self.detect_game_over():
+            self.game_over()
+
+    def clear_lines(self):
+        """揃った行を削除待ちにする（実際の削除は finish_clear_lines）"""
+        full_lines = self.board.full_lines()
+        # 削除待ちの行は数え直さない
+        new_lines = [y for y in full_lines if y not in self.clearing_lines]
+        if not new_lines:
+            return
+        self.clearing_lines = full_lines
+        self.score += len(new_lines)
+        self.lines += len(new_lines)
+        self.level = self.start_level + self.lines // LINES_PER_LEVEL
+        self.gravity = GRAVITY_TABLE[min(self.level, len(GRAVITY_TABLE) - 1)]
+        if self.on_lines_cleared:
+            self.on_lines_cleared(self, new_lines)
+        if self.clear_delay:
+            self.clear_timer = self.clear_delay
+        else:
+            self.finish_clear_lines()
+
+    def finish_clear_lines(self):
+        self.board.remove_lines(self.clearing_lines)
+        self.rotation_cache.clear()
+        self.clearing_lines = []
+        self.clear_timer = 0
+
+    def detect_game_over(self):
+        # 最上段にブロックが積もったかを判定
+        return self.board.row_has_blocks(0)
+
+    def game_over(self):
+        if self.is_game_over:
+            return
+        self.is_game_over = True
+        if self.on_game_over:
+            self.on_game_over(self)
@@ -0,0 +1,103 @@
+"""ボールやパーティクルをまとめて動かすプール（Kivyに依存しない）
+
+位置・速度・大きさ・色・寿命を、あらかじめ確保した NumPy 配列に
+エンティティごとの行として持つ。移動と壁での跳ね返りは全件を1回の
+ベクトル演算で行い、描画用の頂点もまとめて書き出す。出現・消滅は
+空き番号のスタックで O(1)。
+"""
+import numpy as np
+
+# 頂点1つ = x, y, r, g, b, a, u, v（u, v は四角形の中での位置 -1〜1。丸く描く用）
+VERTEX_SIZE = 8
+QUAD_SIZE = VERTEX_SIZE * 4
+_CORNERS = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=np.float32)
+_UV = _CORNERS * 2 - 1
+
+
+class EntityPool:
+    """同じ種類のエンティティを capacity 個まで入れておく固定長プール"""
+    def __init__(self, capacity, bounce=False, gravity=0.0):
+        self.capacity = capacity
+        self.bounce = bounce  # True なら左・右・上の壁で跳ね返る
+        self.gravity = gravity  # 1フレームごとに vy へ足す値
+        self.pos = np.zeros((capacity, 2), dtype=np.float64)  # 左下の座標
+        self.vel = np.zeros((capacity, 2), dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self.color = np.zeros((capacity, 4), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float64)  # 残りフレーム数（inf = 無期限）
+        self.max_life = np.ones(capacity, dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))  # 空き番号（末尾から使う）
+
+    def __len__(self):
+        return self.capacity - len(self._free)
+
+    def indices(self):
+        """使用中の番号"""
+        return np.flatnonzero(self.active)
+
+    def spawn(self, x, y, vx, vy, size, rgba, life=float('inf')):
+        """1つ出して番号を返す。満杯なら None"""
+        if not self._free:
+            return None
+        index = self._free.pop()
+        self.pos[index] = (x, y)
+        self.vel[index] = (vx, vy)
+        self.size[index] = size
+        self.color[index] = rgba
+        self.life[index] = life
+        self.max_life[index] = life if life != float('inf') else 1.0
+        self.active[index] = True
+        return index
+
+    def kill(self, index):
+        if self.active[index]:
+            self.active[index] = False
+            self._free.append(int(index))
+
+    def clear(self):
+        self.active[:] = False
+        self._free = list(range(self.capacity - 1, -1, -1))
+
+    def step(self, bounds, mask=None):
+        """全件を1フレーム分動かす（mask で対象を絞れる）。寿命が尽きたものは消す"""
+        moving = self.active if mask is None else self.active & mask
+        if not moving.any():
+            return
+        if self.gravity:
+            self.vel[moving, 1] += self.gravity
+        self.pos[moving] += self.vel[moving]
+        if self.bounce:
+            width, height = bounds
+            pos, vel, size = self.pos, self.vel, self.size
+            hit = moving & (pos[:, 0] < 0)
+            pos[hit, 0] = -pos[hit, 0]
+            vel[hit, 0] = np.abs(vel[hit, 0])
+            right = width - size
+            hit = moving & (pos[:, 0] > right)
+            pos[hit, 0] = 2 * right[hit] - pos[hit, 0]
+            vel[hit, 0] = -np.abs(vel[hit, 0])
+            top = height - size
+            hit = moving & (pos[:, 1] > top)
+            pos[hit, 1] = 2 * top[hit] - pos[hit, 1]
+            vel[hit, 1] = -np.abs(vel[hit, 1])
+        self.life[moving] -= 1
+        # 画面の下へ完全に出たものも消す
+        self.life[moving & (self.pos[:, 1] + self.size < 0)] = 0
+        for index in np.flatnonzero(moving & (self.life <= 0)):
+            self.kill(index)
+
+    def write_vertices(self, out, fade=False):
+        """頂点を out（(capacity*4, VERTEX_SIZE) の float32 配列）に書き出す
+
+        使っていない枠は大きさ0の四角形になるので描かれない。
+        fade=True なら残り寿命に応じて透明にしていく。
+        """
+        quads = out.reshape(self.capacity, 4, VERTEX_SIZE)
+        size = np.where(self.active, self.size, 0.0).astype(np.float32)
+        quads[:, :, 0:2] = self.pos[:, None, :] + _CORNERS[None, :, :] * size[:, None, None]
+        quads[:, :, 2:6] = self.color[:, None, :]
+        if fade:
+            alpha = np.clip(self.life / self.max_life, 0.0, 1.0).astype(np.float32)
+            quads[:, :, 5] *= alpha[:, None]
+        quads[:, :, 6:8] = _UV
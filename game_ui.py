@@ -0,0 +1,591 @@
+"""ゲーム画面の UI（盤面・先読み・計測オーバーレイ・ボタン類）
+
+タイトル画面の表示には不要なので、teto からは最初にゲーム画面へ
+移るとき（またはタイトル表示後の先読み）に読み込む。
+"""
+import os
+from time import perf_counter
+
+from kivy.app import App
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+from kivy.clock import Clock
+from kivy.uix.floatlayout import FloatLayout
+from kivy.graphics import Color, Rectangle
+
+from engine import (TetrisEngine, TICK_RATE, MOVE_LEFT, MOVE_RIGHT,
+                    ROTATE_LEFT, ROTATE_RIGHT, HARD_DROP)
+from replay import ReplayRecorder, ReplayPlayer
+from bot import Bot
+from gameloop import FixedStepLoop
+from log import get_logger
+from audio import get_audio_manager
+from perf import Profiler, FRAME_BUCKETS_MS
+import snapshot
+from renderer import make_renderer, STATE_COLORS, ACTIVE
+
+# 盤面の描画方式（'rect' = マスごとの Rectangle, 'mesh' = 単一 Mesh）
+# 実機で比較できるよう環境変数 TETO_RENDER でも切り替えられる
+RENDER_MODE = os.environ.get('TETO_RENDER', 'rect')
+# TETO_PERF=1 で起動時から計測とオーバーレイを有効にする
+PERF_ENABLED = os.environ.get('TETO_PERF') == '1'
+# デモプレイでボットが操作する間隔（tick）。人が操作しているように見える速さにする
+BOT_INTERVAL_TICKS = 4
+# フレーム予算超過の警告は、この秒数に1回の件数まとめにする（ログが溢れないように）
+OVERRUN_LOG_INTERVAL = 1.0
+
+board_log = get_logger('board')
+
+
+class GameBoard(Widget):  # ゲームボードを表すクラス。KivyのWidgetを継承している。
+    """TetrisEngine の状態を描画し、入力とタイマーを橋渡しするビュー"""
+    def __init__(self, parent_ui=None, render_mode=None, seed=None, **kwargs):
+        super().__init__(**kwargs)  # 親クラス（Widget）の初期化を呼び出す
+        self.is_paused = False  # ← 一時停止フラグ
+        self.started = False    # すでにあるstart済みかチェック用
+        self.parent_ui = parent_ui  # 明示的にTetrisUIを受け取る
+        self.cols = 10  # 横方向のマスの数（テトリスなどでは通常10列）
+        self.rows = 20  # 縦方向のマスの数（テトリスの標準的な高さ）
+        self.cell_size = 0  # 各マスの大きさ（あとで計算される予定）
+        # ルール本体（盤面・ミノ・スコア）は Kivy に依存しないエンジンが持つ
+        self.engine = TetrisEngine(self.cols, self.rows, seed=seed)
+        self.engine.on_lines_cleared = self.on_lines_cleared
+        self.engine.on_game_over = self.on_game_over
+        # 操作はすべてリプレイとして記録する（再生中は replay_player が操作する）
+        self.recorder = ReplayRecorder(self.engine)
+        self.replay_player = None
+        self.last_replay = None
+        self.bot = None  # デモプレイ中は Bot が操作する
+        self._demo_event = None
+        self.preview = None  # 次のミノ表示（TetrisUI が設定する）
+        # フレーム時間と区間ごとの処理時間の計測（無効ならほぼコストなし）
+        self.profiler = Profiler(enabled=PERF_ENABLED)
+        self._update_section = self.profiler.section('update')
+        self._draw_section = self.profiler.section('draw')
+        self._input_section = self.profiler.section('input')
+        self.engine.clear_lines = self.profiler.wrap('clear_lines', self.engine.clear_lines)
+        # 描画命令を常駐させる差分描画
+        self.render_mode = render_mode or RENDER_MODE
+        self.renderer = make_renderer(self.render_mode, self.canvas, self.cols, self.rows)
+        # ロジックは一定レートで進め、描画は1フレーム1回までにまとめる
+        self.loop = FixedStepLoop(self.tick, self.draw, tick_rate=TICK_RATE,
+                                  on_overrun=self.on_frame_overrun)
+        self._overrun_count = 0
+        self._overrun_worst = 0.0
+        self._overrun_logged_at = perf_counter()
+        self._clock_event = None
+        # 毎フレーム呼ぶ唯一のイベント（作り直さず、開始・停止だけ切り替える）
+        self.update_event = Clock.create_trigger(self.update, 0, interval=True)
+        # 万一 __init__ 前にスケジュールされていたらキャンセルする
+        Clock.unschedule(self.update)
+        # ウィジェットのサイズまたは位置が変わったときに on_size を呼び出す
+        self.bind(size=self.on_size, pos=self.on_size)
+        self.audio = parent_ui.audio  # ← 親の AudioManager を受け取る
+
+    # エンジンの状態をそのまま見せる
+    @property
+    def board(self):
+        return self.engine.board
+
+    @property
+    def current_piece(self):
+        return self.engine.current_piece
+
+    @property
+    def clearing_lines(self):
+        return self.engine.clearing_lines
+
+    @property
+    def score(self):
+        return self.engine.score
+
+    @property
+    def is_game_over(self):
+        return self.engine.is_game_over
+
+    def start(self):
+        board_log.info("start called")
+        self.started = True
+        self.is_paused = False
+        self.schedule_update()
+        if self.audio:
+            self.audio.play_bgm()  # ゲーム開始時にBGM再生（オーディオスレッドで鳴らす）
+
+    def stop(self):
+        board_log.info("stop called")
+        if self.audio:
+            self.audio.stop_bgm()
+        if self._clock_event:
+            self._clock_event.cancel()
+            self._clock_event = None
+            board_log.debug("Clock cancelled")
+
+    def on_size(self, *args):
+        self.cell_size = min(self.width / self.cols, self.height / self.rows)
+        self.renderer.resize(self)
+        self.draw()
+
+    def draw(self):
+        # 変化したマスだけ塗り直す（グリッドは on_size で作り直す）
+        with self._draw_section:
+            ghost_y = None if self.is_game_over else self.engine.ghost_y()
+            self.renderer.update(self.board, self.current_piece, self.clearing_lines, ghost_y)
+            if self.preview:
+                self.preview.refresh(self.engine)
+
+    def can_move(self, dx, dy, rotation_offset=0):
+        return self.engine.can_move(dx, dy, rotation_offset)
+
+    def request_draw(self):
+        # 入力のたびに描かず、次のフレームでまとめて描く
+        self.loop.mark_dirty()
+
+    def send_action(self, action):
+        # 入力はエンジンの step を通す（リプレイに記録される）
+        if self.bot and self.parent_ui:
+            self.parent_ui.back_to_title(None)  # デモ中に操作されたらタイトルへ戻る
+            return
+        if self.replay_player or self.is_game_over:
+            return  # リプレイ再生中は操作を受け付けない
+        with self._input_section:
+            self.engine.step(action)
+            self.request_draw()
+
+    def move_piece(self, dx):
+        self.send_action(MOVE_LEFT if dx < 0 else MOVE_RIGHT)
+
+    def rotate_piece(self, left=False):
+        self.send_action(ROTATE_LEFT if left else ROTATE_RIGHT)
+
+    def move_left(self):
+        self.move_piece(-1)
+
+    def move_right(self):
+        self.move_piece(1)
+
+    def rotate_right(self):
+        self.rotate_piece(left=False)
+
+    def rotate_left(self):
+        self.rotate_piece(left=True)
+
+    def hard_drop(self):
+        self.send_action(HARD_DROP)
+
+    def on_lines_cleared(self, engine, lines):
+        # ハイライト中の待ち時間はエンジンが tick で数える
+        board_log.info("Cleared %d line(s)", len(lines))
+
+        if self.audio:
+            self.audio.play('line_clear')  # 空いている voice で鳴らすので前の音は切れない
+
+        if self.parent_ui:
+            self.parent_ui.update_score(engine.score)
+
+    def update(self, dt):
+        # 描画フレームごとに呼ばれ、経過時間ぶんだけロジックを進める
+        self.profiler.frame()
+        with self._update_section:
+            self.loop.advance(dt)
+
+    def tick(self):
+        # 固定タイムステップ1回分。状態が変わったら True（次の描画対象）
+        if not self.started or self.is_paused:
+            return False  # ← 停止中は何もしない
+        if self.is_game_over:
+            return False
+        replayed = False
+        if self.replay_player:
+            replayed = self.replay_player.apply_due(self.engine)
+        elif self.bot and self.engine.ticks % BOT_INTERVAL_TICKS == 0:
+            self.engine.step(self.bot.next_action())
+            replayed = True
+        moved = self.engine.tick() or replayed
+        if __debug__ and moved:
+            board_log.debug("update: started=%s, paused=%s", self.started, self.is_paused)
+        return moved
+
+    def on_frame_overrun(self, elapsed):
+        self._overrun_count += 1
+        self._overrun_worst = max(self._overrun_worst, elapsed)
+        self.profiler.set_gauge('frame_overruns', self.loop.overruns)
+        now = perf_counter()
+        if now - self._overrun_logged_at < OVERRUN_LOG_INTERVAL:
+            return
+        board_log.warning("%d frame(s) over budget in the last %.1f s (worst %.1f ms)",
+                          self._overrun_count, now - self._overrun_logged_at,
+                          self._overrun_worst * 1000)
+        self._overrun_count = 0
+        self._overrun_worst = 0.0
+        self._overrun_logged_at = now
+
+    def on_game_over(self, engine):
+        board_log.info("Game Over")
+        # 止める前に最後の盤面を描いておく（ハードドロップで終わると次のフレームが来ない）
+        self.loop.flush()
+        self.stop_update()
+        self.stop()
+        if self.bot:
+            # デモは少し待ってから最初からやり直す
+            self._demo_event = Clock.schedule_once(lambda dt: self.start_demo(), 2)
+            return
+        if self.replay_player is None and self.recorder is not None:
+            self.last_replay = self.recorder.finish()
+        if self.parent_ui and hasattr(self.parent_ui, 'show_game_over'):
+            board_log.debug("Calling parent's show_game_over()")
+            self.parent_ui.show_game_over()
+        else:
+            board_log.warning("No show_game_over method in parent_ui: %r", self.parent)
+
+    def reset(self):
+        board_log.info("Resetting GameBoard")
+
+        # ボード・ミノ・スコア・フラグを初期化
+        self.engine.reset()
+        self.replay_player = None
+        self.bot = None
+        self.recorder = ReplayRecorder(self.engine)
+
+        # 既存の描画をすべて削除（必要なら）
+        self.clear_widgets()
+
+        # タイマーをリセット
+        self._clock_event = None
+
+    def play_replay(self, replay):
+        """記録したゲームを画面上で再生する"""
+        self.engine.start_level = replay.start_level
+        self.engine.randomizer = replay.randomizer
+        self.engine.reset(seed=replay.seed)
+        self.engine.recorder = None
+        self.replay_player = ReplayPlayer(replay)
+        self.request_draw()
+        self.start()
+
+    def start_demo(self):
+        """ボットに遊ばせるデモ（アトラクトモード）を始める"""
+        self.stop_update()
+        self.reset()
+        self.bot = Bot(self.engine)
+        self.request_draw()
+        self.start()
+
+    def stop_demo(self):
+        self.bot = None
+        if self._demo_event:
+            self._demo_event.cancel()
+            self._demo_event = None
+
+    def snapshot(self):
+        """続きを遊べるようにするためのスナップショット（デモ・再生中・終了後は None）"""
+        if not self.started or self.is_game_over or self.bot or self.replay_player:
+            return None
+        return snapshot.capture(self.engine)
+
+    def restore_snapshot(self, data):
+        """snapshot() の状態に戻す。開始は start() で行う"""
+        self.stop_demo()
+        self.replay_player = None
+        snapshot.restore(self.engine, data)
+        # リプレイは最初からの操作が必要なので、途中から再開したゲームは記録しない
+        self.engine.recorder = None
+        self.recorder = None
+        self.last_replay = None
+        self.request_draw()
+
+    def save_replay(self, path):
+        if self.last_replay:
+            self.last_replay.save(path)
+
+    def resume_game(self, dt=None):
+        board_log.info("Resuming game after pause")
+        self.is_paused = False
+        self.schedule_update()
+
+    def schedule_update(self):
+        # 同じイベントを使い回すので、何度呼んでも二重登録にならない
+        if not self.update_event.is_triggered:
+            board_log.debug("Scheduling update_event")
+            self.loop.reset()
+            self.update_event()
+
+    def stop_update(self):
+        self.update_event.cancel()
+
+    def pause_game(self):
+        board_log.info("Game paused")
+        # フレーム処理は続け、tick だけ止める
+        self.is_paused = True
+
+class NextPreview(Widget):
+    """次に出るミノの先読み表示。描画命令は作り置きし、キューが変わったときだけ動かす"""
+    def __init__(self, count=3, **kwargs):
+        super().__init__(**kwargs)
+        self.count = count
+        self._slots = []  # 枠ごとの Rectangle 4つ
+        with self.canvas:
+            Color(*STATE_COLORS[ACTIVE])
+            for _ in range(count):
+                self._slots.append([Rectangle(pos=(0, 0), size=(0, 0)) for _ in range(4)])
+        self._pieces = []
+        self._queue = None
+        self._version = None
+        self.bind(size=self._layout, pos=self._layout)
+
+    def refresh(self, engine):
+        queue = engine.queue
+        if queue is self._queue and queue.version == self._version:
+            return  # 変化なし
+        self._queue = queue
+        self._version = queue.version
+        self._pieces = engine.next_pieces(self.count)
+        self._layout()
+
+    def _layout(self, *args):
+        slot_height = self.height / self.count
+        cell = min(self.width / 5, slot_height / 5)
+        for i, rects in enumerate(self._slots):
+            if i >= len(self._pieces):
+                for rect in rects:
+                    rect.size = (0, 0)
+                continue
+            kind = self._pieces[i]
+            left, top, right, bottom = kind.bboxes[0]
+            # 枠の中央にミノの外接矩形を合わせる
+            x0 = self.center_x - (right - left + 1) * cell / 2
+            y0 = self.top - (i + 0.5) * slot_height + (bottom - top + 1) * cell / 2
+            for rect, (dx, dy) in zip(rects, kind.cells[0]):
+                rect.pos = (x0 + (dx - left) * cell, y0 - (dy - top + 1) * cell)
+                rect.size = (cell, cell)
+
+
+def _count_group(group, seen):
+    # InstructionGroup の中まで数える（子ウィジェットの canvas は親の canvas に
+    # 入っているので、seen で同じ命令を2回数えないようにする）
+    total = 0
+    for instruction in group.children:
+        if id(instruction) in seen:
+            continue
+        seen.add(id(instruction))
+        total += 1
+        if hasattr(instruction, 'children'):
+            total += _count_group(instruction, seen)
+    return total
+
+
+def count_instructions(widget, seen=None):
+    """ウィジェットツリー全体の canvas 命令数（入れ子のグループの中身も含む）"""
+    if seen is None:
+        seen = set()
+    total = 0
+    for canvas in (widget.canvas.before, widget.canvas, widget.canvas.after):
+        seen.add(id(canvas))
+        total += _count_group(canvas, seen)
+    for child in widget.children:
+        total += count_instructions(child, seen)
+    return total
+
+
+class PerfOverlay(Label):
+    """Profiler の値を半透明の文字で重ねて表示するデバッグ用オーバーレイ"""
+    def __init__(self, profiler, root, interval=0.5, **kwargs):
+        kwargs.setdefault('font_size', '12sp')
+        kwargs.setdefault('halign', 'left')
+        kwargs.setdefault('valign', 'top')
+        kwargs.setdefault('color', (1, 1, 0, 0.9))
+        super().__init__(**kwargs)
+        self.profiler = profiler
+        self.root_widget = root  # 描画命令数を数える範囲
+        self.interval = interval
+        self._event = None
+        self.bind(size=self.setter('text_size'))
+        self.opacity = 0
+
+    @property
+    def visible(self):
+        return self._event is not None
+
+    def show(self):
+        self.profiler.enable()
+        self.opacity = 1
+        if self._event is None:
+            self._event = Clock.schedule_interval(self.refresh, self.interval)
+        self.refresh()
+
+    def hide(self):
+        self.opacity = 0
+        self.text = ''
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+        self.profiler.disable()
+
+    def toggle(self, *args):
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def refresh(self, *args):
+        profiler = self.profiler
+        profiler.set_gauge('canvas_instructions', count_instructions(self.root_widget))
+        snap = profiler.snapshot()
+        frames = snap['frames']
+        lines = [f"FPS {snap['fps']:.1f}  frame {frames['mean_ms']:.1f}/"
+                 f"{frames['p95_ms']:.1f}/{frames['max_ms']:.1f} ms (avg/p95/max)"]
+        # フレーム時間ヒストグラムを横棒で
+        total = max(sum(profiler.histogram), 1)
+        limits = [f'<{limit:g}' for limit in FRAME_BUCKETS_MS] + [f'>={FRAME_BUCKETS_MS[-1]:g}']
+        for label, count in zip(limits, profiler.histogram):
+            lines.append(f"{label:>5}ms {'#' * round(20 * count / total):<20} {count}")
+        for name, stats in snap['sections'].items():
+            lines.append(f"{name:<12} {stats['mean_ms']:.3f}/{stats['max_ms']:.3f} ms x{stats['calls']}")
+        lines.append(f"canvas {snap['gauges']['canvas_instructions']}  "
+                     f"overruns {snap['gauges'].get('frame_overruns', 0)}  "
+                     f"gc {profiler.gc_rate():.1f}/s {snap['gc_collections']}")
+        self.text = '\n'.join(lines)
+
+
+class TetrisUI(FloatLayout):  # Tetrisアプリ全体のUIを構成するクラス。BoxLayoutを継承。
+    def __init__(self, screen_manager=None, **kwargs):
+        super().__init__(**kwargs)
+        self.screen_manager = screen_manager
+        self.saved_snapshot = None  # 最後に保存したスナップショット（bytes）
+
+        # BGM・効果音はオーディオスレッドで読み込み済み（または読み込み中）
+        self.audio = get_audio_manager()
+
+        main_layout = BoxLayout(orientation='horizontal', size_hint=(1, 1))
+
+        self.game_board = GameBoard(parent_ui=self)
+
+        # 左コントロール
+        left_controls = BoxLayout(orientation='vertical', size_hint=(0.2, 1))
+        left_move_btn = Button(text='L Move')
+        left_rotate_btn = Button(text='L Rotate')
+        # スコア表示用ラベル
+        self.score_label = Label(text='Score: 0', font_size='20sp', size_hint=(1, 0.2),
+                         halign='center', valign='middle')
+        self.score_label.bind(size=self.score_label.setter('text_size'))  # テキストを中央に揃える
+        left_move_btn.bind(on_press=lambda instance: self.game_board.move_piece(-1))
+        left_rotate_btn.bind(on_press=lambda instance: self.game_board.rotate_piece(left=True))
+        left_controls.add_widget(left_move_btn)
+        left_controls.add_widget(left_rotate_btn)
+        left_controls.add_widget(Widget())  # 空白で真ん中調整
+        left_controls.add_widget(self.score_label)
+        # 計測オーバーレイの表示切り替え
+        perf_btn = Button(text='Perf', size_hint=(1, 0.08))
+        left_controls.add_widget(perf_btn)
+
+        # 中央ゲームエリア
+        center_area = BoxLayout(size_hint=(0.6, 1))
+        center_area.add_widget(self.game_board)
+        self.game_board.size_hint = (1, 1)
+
+        # 右コントロール
+        right_controls = BoxLayout(orientation='vertical', size_hint=(0.2, 1))
+        right_move_btn = Button(text='R Move')
+        right_rotate_btn = Button(text='R Rotate')
+        hard_drop_btn = Button(text='Hard Drop')
+        right_move_btn.bind(on_press=lambda instance: self.game_board.move_piece(1))
+        right_rotate_btn.bind(on_press=lambda instance: self.game_board.rotate_piece(left=False))
+        hard_drop_btn.bind(on_press=lambda instance: self.game_board.hard_drop())
+        # 次のミノの先読み表示
+        self.next_label = Label(text='NEXT', size_hint=(1, 0.05))
+        self.next_preview = NextPreview(size_hint=(1, 0.35))
+        self.game_board.preview = self.next_preview
+        right_controls.add_widget(self.next_label)
+        right_controls.add_widget(self.next_preview)
+        right_controls.add_widget(right_move_btn)
+        right_controls.add_widget(right_rotate_btn)
+        right_controls.add_widget(hard_drop_btn)
+
+        main_layout.add_widget(left_controls)
+        main_layout.add_widget(center_area)
+        main_layout.add_widget(right_controls)
+
+        self.add_widget(main_layout)
+
+        # オーバーレイは最前面に表示
+        self.overlay = FloatLayout()
+        self.overlay_label = Label(text='GAME OVER', font_size='40sp',
+                                   size_hint=(None, None), size=(400, 100),
+                                   pos_hint={'center_x': 0.5, 'center_y': 0.7})
+        continue_btn = Button(text='Continue', size_hint=(0.3, 0.1),
+                              pos_hint={'center_x': 0.5, 'center_y': 0.5})
+        title_btn = Button(text='Back to Title', size_hint=(0.3, 0.1),
+                           pos_hint={'center_x': 0.5, 'center_y': 0.35})
+        continue_btn.bind(on_press=self.continue_game)
+        title_btn.bind(on_press=self.back_to_title)
+        self.overlay.add_widget(self.overlay_label)
+        self.overlay.add_widget(continue_btn)
+        self.overlay.add_widget(title_btn)
+        self.overlay.opacity = 0
+        self.add_widget(self.overlay)
+
+        self.perf_overlay = PerfOverlay(self.game_board.profiler, self,
+                                        size_hint=(0.6, 0.5),
+                                        pos_hint={'x': 0.2, 'top': 1})
+        perf_btn.bind(on_press=self.perf_overlay.toggle)
+        self.add_widget(self.perf_overlay)
+        if PERF_ENABLED:
+            self.perf_overlay.show()
+
+    def show_game_over(self):
+        self.overlay.opacity = 1  # ゲームオーバー表示
+        self.discard_snapshot()  # 終わったゲームは続きから遊べない
+        # 不具合報告の再現用に直前のゲームを保存しておく
+        app = App.get_running_app()
+        if app:
+            self.game_board.save_replay(os.path.join(app.user_data_dir, 'last_replay.trpl'))
+            if self.game_board.profiler.enabled:
+                self.game_board.profiler.export(os.path.join(app.user_data_dir, 'perf_last_game.json'))
+
+    def continue_game(self, instance):
+        self.overlay.opacity = 0
+        self.game_board.reset()
+        self.game_board.start()  # start()の中でschedule_update()を呼ぶのでここで再度呼ばなくてOK
+        self.update_score(0)
+
+    def save_snapshot(self):
+        """プレイ中のゲームを保存する（書き込みは裏のスレッド）。Future か None を返す"""
+        data = self.game_board.snapshot()
+        if data is None:
+            return None
+        self.saved_snapshot = data  # 同じプロセス内ではファイルを読まずに戻す
+        app = App.get_running_app()
+        if app:
+            return snapshot.save_async(data, app.snapshot_path)
+        return None
+
+    def discard_snapshot(self):
+        self.saved_snapshot = None
+        app = App.get_running_app()
+        if app:
+            snapshot.discard_async(app.snapshot_path)
+
+    def resume_snapshot(self, data=None):
+        """保存したゲームの続きを始める。保存がなければ False"""
+        data = data or self.saved_snapshot
+        if data is None:
+            return False
+        self.overlay.opacity = 0
+        self.game_board.restore_snapshot(data)
+        self.saved_snapshot = data
+        self.game_board.start()
+        self.update_score(self.game_board.score)
+        return True
+
+    def back_to_title(self, instance):
+        self.save_snapshot()  # タイトルから「Continue」で続きを遊べるように
+        self.game_board.stop_update()
+        self.game_board.stop_demo()
+        self.audio.stop_bgm()
+        self.overlay.opacity = 0
+        if self.screen_manager:
+            self.screen_manager.current = 'title'
+
+    def update_score(self, new_score):
+        self.score_label.text = f"Score: {new_score}"
@@ -0,0 +1,71 @@
+"""固定タイムステップのゲームループ（Kivyに依存しない）
+
+描画フレームごとに advance(dt) を呼ぶと、経過時間をアキュムレータに
+貯めて一定間隔でロジックを進める。描画は dirty フラグが立っている
+ときだけ、1フレームに最大1回行う。
+"""
+from time import perf_counter
+
+
+class FixedStepLoop:
+    """ロジックを一定レートで進め、描画をフレームごとにまとめるループ"""
+    def __init__(self, step, render, tick_rate=60, frame_budget=1 / 60,
+                 max_steps=5, on_overrun=None):
+        self.step = step  # 1tick進める関数（状態が変わったら True を返す）
+        self.render = render  # 描画関数
+        self.tick = 1.0 / tick_rate
+        self.frame_budget = frame_budget  # 1フレームで使ってよい時間（秒）
+        self.max_steps = max_steps  # 1フレームで進める最大tick数（遅延の雪だるま防止）
+        self.on_overrun = on_overrun  # 予算超過時に (経過秒) で呼ばれる
+        self.accumulator = 0.0
+        self.dirty = True
+        self.ticks = 0
+        self.frames = 0
+        self.overruns = 0
+        self.dropped_ticks = 0  # 追いつけずに捨てたtick数
+        self.last_frame_time = 0.0
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.dirty = True
+
+    def mark_dirty(self):
+        """次のフレームで描画する"""
+        self.dirty = True
+
+    def flush(self):
+        """描画待ちがあれば次のフレームを待たずに今描画する（ループを止める前など）"""
+        if self.dirty:
+            self.dirty = False
+            self.render()
+
+    def advance(self, dt):
+        """描画フレーム1回分の処理"""
+        start = perf_counter()
+        self.accumulator += dt
+        tick = self.tick
+        steps = 0
+        while self.accumulator >= tick:
+            if steps == self.max_steps:
+                # 大きく遅れたぶんは捨てて、次のフレームから通常どおり進める
+                self.dropped_ticks += int(self.accumulator / tick)
+                self.accumulator = 0.0
+                break
+            if self.step():
+                self.dirty = True
+            self.accumulator -= tick
+            self.ticks += 1
+            steps += 1
+
+        if self.dirty:
+            self.dirty = False
+            self.render()
+
+        self.frames += 1
+        elapsed = perf_counter() - start
+        self.last_frame_time = elapsed
+        if elapsed > self.frame_budget:
+            self.overruns += 1
+            if self.on_overrun:
+                self.on_overrun(elapsed)
+        return steps
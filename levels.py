@@ -0,0 +1,214 @@
+"""ブロック崩しのステージ定義と読み込み（Kivyに依存しない）
+
+ステージはテキストで書き、配布用には1つのパックファイルにまとめる。
+
+テキスト形式（assets/levels.txt）:
+    = ステージ名
+    rrrrrrrr
+    o.oo.oo.
+    ...
+1文字が1ブロックで、種類は BRICK_TYPES の文字で表す（'.' は空き）。
+
+パック形式（assets/levels.pak、数値は可変長整数 varint）:
+    b'BLVL' バージョン(1バイト) ステージ数 [各ステージの長さ] ...
+    各ステージ: 名前の長さ 名前(UTF-8) 列数 行数 [連続数 種類番号] ...
+行を上から順に並べたセルを (同じ種類の連続数, 種類) で圧縮している。
+
+    python levels.py build    # levels.txt から levels.pak を作る
+"""
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from replay import write_varint, read_varint
+
+MAGIC = b'BLVL'
+VERSION = 1
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+LEVELS_TEXT = os.path.join(ASSET_DIR, 'levels.txt')
+LEVELS_PAK = os.path.join(ASSET_DIR, 'levels.pak')
+
+# char: テキストでの文字, hp: 壊れるまでの回数（0 は壊れない）, rgba: 色
+BrickType = namedtuple('BrickType', 'char hp rgba')
+BRICK_TYPES = (
+    None,  # 0 = 空き
+    BrickType('r', 1, (1.0, 0.3, 0.3, 1)),
+    BrickType('o', 1, (1.0, 0.6, 0.2, 1)),
+    BrickType('y', 1, (1.0, 0.9, 0.3, 1)),
+    BrickType('g', 1, (0.3, 0.9, 0.4, 1)),
+    BrickType('b', 1, (0.3, 0.6, 1.0, 1)),
+    BrickType('p', 1, (0.8, 0.4, 1.0, 1)),
+    BrickType('S', 2, (0.75, 0.75, 0.8, 1)),  # 2回で壊れる
+    BrickType('G', 3, (0.9, 0.75, 0.2, 1)),   # 3回で壊れる
+    BrickType('X', 0, (0.4, 0.4, 0.45, 1)),   # 壊れない
+)
+TYPE_CODES = {brick.char: code for code, brick in enumerate(BRICK_TYPES) if brick}
+TYPE_CODES['.'] = 0
+
+# cells は上の行から順に並べた種類番号（bytes）
+Level = namedtuple('Level', 'name cols rows cells')
+
+
+def parse_text(text):
+    """テキスト形式を Level のリストにする"""
+    levels = []
+    name = None
+    lines = []
+
+    def finish():
+        if name is None:
+            return
+        if not lines:
+            raise ValueError(f'level {name!r} has no rows')
+        cols = max(len(line) for line in lines)
+        cells = bytearray()
+        for line in lines:
+            for char in line.ljust(cols, '.'):
+                if char not in TYPE_CODES:
+                    raise ValueError(f'level {name!r}: unknown brick {char!r}')
+                cells.append(TYPE_CODES[char])
+        levels.append(Level(name, cols, len(lines), bytes(cells)))
+
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('='):
+            finish()
+            name = line[1:].strip()
+            lines = []
+        else:
+            if name is None:
+                raise ValueError('level rows before the first "= name" line')
+            lines.append(line)
+    finish()
+    return levels
+
+
+def encode_level(level):
+    out = bytearray()
+    name = level.name.encode('utf-8')
+    write_varint(out, len(name))
+    out += name
+    write_varint(out, level.cols)
+    write_varint(out, level.rows)
+    cells = level.cells
+    i = 0
+    while i < len(cells):
+        code = cells[i]
+        run = 1
+        while i + run < len(cells) and cells[i + run] == code:
+            run += 1
+        write_varint(out, run)
+        write_varint(out, code)
+        i += run
+    return bytes(out)
+
+
+def decode_level(data, pos=0):
+    length, pos = read_varint(data, pos)
+    name = bytes(data[pos:pos + length]).decode('utf-8')
+    pos += length
+    cols, pos = read_varint(data, pos)
+    rows, pos = read_varint(data, pos)
+    total = cols * rows
+    cells = bytearray()
+    while len(cells) < total:
+        run, pos = read_varint(data, pos)
+        code, pos = read_varint(data, pos)
+        cells += bytes((code,)) * run
+    return Level(name, cols, rows, bytes(cells))
+
+
+def pack(levels):
+    """Level のリストをパック形式のバイト列にする"""
+    blobs = [encode_level(level) for level in levels]
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    write_varint(out, len(blobs))
+    for blob in blobs:
+        write_varint(out, len(blob))
+    for blob in blobs:
+        out += blob
+    return bytes(out)
+
+
+class LevelPack:
+    """パックファイルの中身。ステージは必要になったときに1つずつ展開する"""
+    def __init__(self, data):
+        if data[:4] != MAGIC:
+            raise ValueError('not a level pack')
+        if data[4] != VERSION:
+            raise ValueError(f'unsupported level pack version: {data[4]}')
+        self.data = memoryview(data)
+        count, pos = read_varint(data, 5)
+        lengths = []
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            lengths.append(length)
+        self.offsets = []  # 各ステージの開始位置
+        for length in lengths:
+            self.offsets.append(pos)
+            pos += length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def level(self, index):
+        return decode_level(self.data, self.offsets[index])
+
+    @classmethod
+    def load(cls, path=LEVELS_PAK):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+
+class LevelLoader:
+    """次のステージを別スレッドで先に展開しておく"""
+    def __init__(self, pack):
+        self.pack = pack
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = {}  # ステージ番号 → Future
+
+    def __len__(self):
+        return len(self.pack)
+
+    def prefetch(self, index):
+        index %= len(self.pack)
+        if index not in self._pending:
+            self._pending[index] = self._executor.submit(self.pack.level, index)
+
+    def get(self, index):
+        """ステージを返す（先読み済みならそれを、なければその場で展開）"""
+        index %= len(self.pack)
+        future = self._pending.pop(index, None)
+        if future is not None:
+            return future.result()
+        return self.pack.level(index)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def build(source=LEVELS_TEXT, target=LEVELS_PAK):
+    with open(source, encoding='utf-8') as f:
+        levels = parse_text(f.read())
+    data = pack(levels)
+    with open(target, 'wb') as f:
+        f.write(data)
+    return levels, data
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'build':
+        print(f'usage: {argv[0]} build [SOURCE [TARGET]]')
+        return 2
+    levels, data = build(*argv[2:4])
+    print(f'{len(levels)} levels, {len(data)} bytes')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,181 @@
+"""レベル付き・サブシステム別の軽量ログ（Kivyに依存しない）
+
+    from log import get_logger
+    log = get_logger('board')
+    log.debug('update: started=%s paused=%s', started, paused)
+
+メッセージは出力するときだけ % で整形するので、無効なレベルの呼び出しは
+レベル比較1回で終わる。毎tick通る箇所は `if __debug__:` で囲んでおけば、
+リリースビルド（python -O、Android の最適化ビルド）では呼び出しごと消える。
+
+出力先のレベルは環境変数 TETO_LOG で指定する（例: "info" や
+"warning,board=debug,screen=info"）。リングバッファに直近のログを
+残しておき、クラッシュ時にファイルへ書き出すこともできる。リングバッファは
+出力先のレベルとは別に自分のレベル（既定 INFO）で受け取るので、何も
+出力しないリリースビルドでもクラッシュ直前の様子が残る。
+"""
+import os
+import sys
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+_LABELS = {DEBUG: 'D', INFO: 'I', WARNING: 'W', ERROR: 'E'}
+
+# リリースビルドでは既定で何も出さない
+DEFAULT_LEVEL = WARNING if __debug__ else OFF
+
+
+class ConsoleSink:
+    """標準エラーに1行ずつ書き出す"""
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, created, channel, level, message):
+        stream = self.stream or sys.stderr
+        stream.write(f'[{_LABELS.get(level, level)}] {channel}: {message}\n')
+
+
+class RingBufferSink:
+    """直近 capacity 件のログをメモリに残す（クラッシュ後のダンプ用）"""
+    def __init__(self, capacity=512):
+        self.entries = deque(maxlen=capacity)
+
+    def write(self, created, channel, level, message):
+        self.entries.append((created, channel, level, message))
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for created, channel, level, message in self.entries:
+                stamp = time.strftime('%H:%M:%S', time.localtime(created))
+                f.write(f'{stamp} [{_LABELS.get(level, level)}] {channel}: {message}\n')
+
+
+class Channel:
+    """サブシステムごとのロガー"""
+    __slots__ = ('name', 'level', 'gate')
+
+    def __init__(self, name, level):
+        self.name = name
+        self.level = level  # 出力のレベル
+        self.gate = min(level, _capture_level)  # これ未満の呼び出しはすぐ戻る
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def debug(self, message, *args):
+        if self.gate <= DEBUG:
+            _emit(self, DEBUG, message, args)
+
+    def info(self, message, *args):
+        if self.gate <= INFO:
+            _emit(self, INFO, message, args)
+
+    def warning(self, message, *args):
+        if self.gate <= WARNING:
+            _emit(self, WARNING, message, args)
+
+    def error(self, message, *args):
+        if self.gate <= ERROR:
+            _emit(self, ERROR, message, args)
+
+
+_channels = {}
+_overrides = {}  # サブシステム名 → レベル
+_default_level = DEFAULT_LEVEL
+# (出力先, その出力先が受け取る最低レベル)。None ならサブシステムのレベルに従う
+_sinks = [(ConsoleSink(), None)]
+_capture_level = OFF  # レベルを持つ出力先（リングバッファなど）の最低レベル
+
+
+def _emit(channel, level, message, args):
+    if args:
+        message = message % args
+    created = time.time()
+    for sink, min_level in _sinks:
+        if level >= (channel.level if min_level is None else min_level):
+            sink.write(created, channel.name, level, message)
+
+
+def _update_gates():
+    global _capture_level
+    _capture_level = min((level for _, level in _sinks if level is not None), default=OFF)
+    for channel in _channels.values():
+        channel.gate = min(channel.level, _capture_level)
+
+
+def get_logger(name):
+    channel = _channels.get(name)
+    if channel is None:
+        channel = _channels[name] = Channel(name, _overrides.get(name, _default_level))
+    return channel
+
+
+def set_level(level, name=None):
+    """name を省略すると全サブシステムの既定レベルを変える"""
+    global _default_level
+    if isinstance(level, str):
+        level = LEVEL_NAMES[level.lower()]
+    if name is None:
+        _default_level = level
+        for channel in _channels.values():
+            if channel.name not in _overrides:
+                channel.level = level
+    else:
+        _overrides[name] = level
+        if name in _channels:
+            _channels[name].level = level
+    _update_gates()
+
+
+def configure(spec):
+    """"warning,board=debug" 形式の文字列でレベルを設定する"""
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '=' in part:
+            name, level = part.split('=', 1)
+            set_level(level.strip(), name.strip())
+        else:
+            set_level(part)
+
+
+def add_sink(sink, level=None):
+    """出力先を足す。level を省略するとサブシステムのレベルに従う"""
+    _sinks.append((sink, level))
+    _update_gates()
+    return sink
+
+
+def remove_sink(sink):
+    _sinks[:] = [(s, level) for s, level in _sinks if s is not sink]
+    _update_gates()
+
+
+def install_crash_dump(path, capacity=512, level=INFO):
+    """直近のログを level 以上でリングバッファに残し、未捕捉例外のときに path へ書き出す
+
+    サブシステムのレベル（TETO_LOG）とは関係なく残すので、リリースビルドでも空にならない。
+    """
+    ring = add_sink(RingBufferSink(capacity), level)
+    previous = sys.excepthook
+
+    def excepthook(exc_type, exc, tb):
+        try:
+            ring.dump(path)
+        finally:
+            previous(exc_type, exc, tb)
+
+    sys.excepthook = excepthook
+    return ring
+
+
+if os.environ.get('TETO_LOG'):
+    configure(os.environ['TETO_LOG'])
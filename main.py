@@ -1,52 +1,161 @@
 from kivy.app import App
 from kivy.uix.widget import Widget
 from kivy.uix.label import Label
-from kivy.graphics import Rectangle, Ellipse, Color
+from kivy.graphics import Rectangle, Color, Mesh, RenderContext
 from kivy.clock import Clock
 from kivy.core.window import Window
+import math
 import random
+from array import array
 
-class Block(Widget):
-    """ブロック"""
-    def __init__(self, x, y, **kwargs):
+import numpy as np
+
+from breakout_physics import BrickGrid, move_ball
+from entities import EntityPool, VERTEX_SIZE as ENTITY_VERTEX_SIZE, QUAD_SIZE as ENTITY_QUAD_SIZE
+from levels import LevelPack, LevelLoader, BRICK_TYPES
+from renderer import MESH_VERTEX_SHADER, MESH_FRAGMENT_SHADER, MESH_FORMAT, VERTEX_SIZE, QUAD_SIZE
+
+BRICK_SIZE = (60, 20)
+
+class BrickField(Widget):
+    """全ブロックを1つの Mesh で描く。ブロックは番号で扱い、壊すと頂点をその場で潰す"""
+    def __init__(self, capacity=64, **kwargs):
         super().__init__(**kwargs)
-        self.size = (60, 20)
-        self.pos = (x, y)
-        with self.canvas:
-            Color(1, random.random(), random.random(), 1)  # ランダムな色
-            self.rect = Rectangle(pos=self.pos, size=self.size)
+        self.count = 0  # 使った枠の数（壊したブロックの枠も含む）
+        self.alive = 0  # 残っているブロックの数
+        self.dirty = False
+        self._vertices = array('f')
+        self._indices = array('H')
+        self.context = RenderContext(vs=MESH_VERTEX_SHADER, fs=MESH_FRAGMENT_SHADER,
+                                     use_parent_projection=True,
+                                     use_parent_modelview=True)
+        self.mesh = Mesh(fmt=MESH_FORMAT, mode='triangles')
+        self.context.add(self.mesh)
+        self.canvas.add(self.context)
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        # 枠を増やすときだけバッファを伸ばす（インデックスは作り置き）
+        current = len(self._vertices) // QUAD_SIZE
+        self._vertices.extend([0.0] * ((capacity - current) * QUAD_SIZE))
+        for i in range(current, capacity):
+            base = i * 4
+            self._indices.extend((base, base + 1, base + 2, base + 2, base + 3, base))
+        self.mesh.vertices = self._vertices
+        self.mesh.indices = self._indices
+
+    def add(self, x, y, width, height, rgba):
+        """ブロックを1つ置いて番号を返す"""
+        index = self.count
+        if (index + 1) * QUAD_SIZE > len(self._vertices):
+            self._grow(max(1, index) * 2)
+        self.count += 1
+        self.alive += 1
+        vertices = self._vertices
+        offset = index * QUAD_SIZE
+        for vx, vy in ((x, y), (x + width, y), (x + width, y + height), (x, y + height)):
+            vertices[offset:offset + VERTEX_SIZE] = array('f', (vx, vy) + tuple(rgba))
+            offset += VERTEX_SIZE
+        self.dirty = True
+        return index
+
+    def set_color(self, index, rgba):
+        vertices = self._vertices
+        offset = index * QUAD_SIZE + 2
+        for _ in range(4):
+            vertices[offset:offset + 4] = array('f', rgba)
+            offset += VERTEX_SIZE
+        self.dirty = True
+
+    def remove(self, index):
+        """ブロックを消す（面積0の四角形にするだけで、ウィジェットは増減しない）"""
+        offset = index * QUAD_SIZE
+        self._vertices[offset:offset + QUAD_SIZE] = array('f', bytes(4 * QUAD_SIZE))
+        self.alive -= 1
+        self.dirty = True
+
+    def clear(self):
+        self._vertices[:self.count * QUAD_SIZE] = array('f', bytes(4 * QUAD_SIZE * self.count))
+        self.count = 0
+        self.alive = 0
+        self.dirty = True
+
+    def flush(self):
+        """変更があれば GPU へ送る（1フレーム1回）"""
+        if self.dirty:
+            self.dirty = False
+            self.mesh.vertices = self._vertices
+
+# ボールとパーティクルを丸く描くシェーダー（四角形の中の位置 vUV で円の外を捨てる）
+ENTITY_VERTEX_SHADER = """
+#ifdef GL_ES
+    precision highp float;
+#endif
+attribute vec2 vPosition;
+attribute vec4 vColor;
+attribute vec2 vUV;
+uniform mat4 modelview_mat;
+uniform mat4 projection_mat;
+varying vec4 frag_color;
+varying vec2 frag_uv;
+
+void main(void) {
+    frag_color = vColor;
+    frag_uv = vUV;
+    gl_Position = projection_mat * modelview_mat * vec4(vPosition, 0.0, 1.0);
+}
+"""
+ENTITY_FRAGMENT_SHADER = """
+#ifdef GL_ES
+    precision mediump float;
+#endif
+varying vec4 frag_color;
+varying vec2 frag_uv;
 
-    def destroy(self):
-        self.canvas.clear()
-        self.parent.remove_widget(self)
+void main(void) {
+    if (dot(frag_uv, frag_uv) > 1.0)
+        discard;
+    gl_FragColor = frag_color;
+}
+"""
+ENTITY_FORMAT = [(b'vPosition', 2, 'float'), (b'vColor', 4, 'float'), (b'vUV', 2, 'float')]
 
-class Ball(Widget):
-    """ボール"""
-    def __init__(self, paddle, **kwargs):
+BALL_SIZE = 20
+BALL_SPEED = 4
+PARTICLES_PER_BRICK = 8
+PARTICLE_LIFE = 30  # フレーム数
+
+
+class EntityLayer(Widget):
+    """複数の EntityPool を1つの Mesh で描く"""
+    def __init__(self, pools, **kwargs):
         super().__init__(**kwargs)
-        self.size = (20, 20)
-        self.paddle = paddle
-        self.reset_position()
-        with self.canvas:
-            Color(1, 1, 1, 1)
-            self.ellipse = Ellipse(pos=self.pos, size=self.size)
-
-    def reset_position(self):
-        """ボールの位置をパドルの上にリセット"""
-        self.pos = (self.paddle.center_x - self.width / 2, self.paddle.top + 10)
-        self.velocity = [random.choice([-4, 4]), 4]  # 上向きに発射
-
-    def move(self):
-        """ボールの移動処理"""
-        self.x += self.velocity[0]
-        self.y += self.velocity[1]
-        self.ellipse.pos = self.pos
-
-        # 壁との衝突判定
-        if self.x <= 0 or self.right >= Window.width:
-            self.velocity[0] *= -1
-        if self.top >= Window.height:
-            self.velocity[1] *= -1
+        self.pools = pools  # (プール, 寿命で薄くするか) のリスト
+        total = sum(pool.capacity for pool, _ in pools)
+        # array('f') のメモリを NumPy から直接書き換える（毎フレームの確保なし）
+        self._vertices = array('f', bytes(4 * total * ENTITY_QUAD_SIZE))
+        view = np.frombuffer(self._vertices, dtype=np.float32).reshape(-1, ENTITY_VERTEX_SIZE)
+        self._views = []
+        offset = 0
+        for pool, _ in pools:
+            self._views.append(view[offset:offset + pool.capacity * 4])
+            offset += pool.capacity * 4
+        indices = array('H')
+        for i in range(total):
+            base = i * 4
+            indices.extend((base, base + 1, base + 2, base + 2, base + 3, base))
+        self.context = RenderContext(vs=ENTITY_VERTEX_SHADER, fs=ENTITY_FRAGMENT_SHADER,
+                                     use_parent_projection=True,
+                                     use_parent_modelview=True)
+        self.mesh = Mesh(vertices=self._vertices, indices=indices,
+                         fmt=ENTITY_FORMAT, mode='triangles')
+        self.context.add(self.mesh)
+        self.canvas.add(self.context)
+
+    def flush(self):
+        for (pool, fade), view in zip(self.pools, self._views):
+            pool.write_vertices(view, fade)
+        self.mesh.vertices = self._vertices
 
 class Paddle(Widget):
     """パドル"""
@@ -68,61 +177,169 @@ class BrickBreakerGame(Widget):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.paddle = Paddle()
-        self.ball = Ball(self.paddle)
-        self.blocks = []
+        # ボールとパーティクルは Widget にせず、プールの配列でまとめて動かす
+        self.balls = EntityPool(32, bounce=True)
+        self.particles = EntityPool(512, gravity=-0.25)
+        self.entity_layer = EntityLayer([(self.balls, False), (self.particles, True)])
+        # ブロックはセルごとに登録し、ボール周辺のセルだけを調べる
+        self.blocks = BrickGrid()
+        self.brick_field = BrickField()
+        self.game_over_label = None
+        # ステージはパックファイルから読み、次のステージは裏で先に展開しておく
+        self.levels = LevelLoader(LevelPack.load())
+        self.level_index = 0
+        self.bricks = {}  # ブロック番号 → [種類, 残り耐久, x, y]
+        self.breakable = 0  # 残っている壊せるブロックの数
+        self.brick_bottom = 0  # 一番下のブロックの y（これより上に来たボールだけ個別に判定する）
+        self.add_widget(self.brick_field)
         self.add_widget(self.paddle)
-        self.add_widget(self.ball)
+        self.add_widget(self.entity_layer)
         self.running = True  # ゲームが動作中かどうか
 
         self.create_blocks()
+        self.reset_balls()
         Clock.schedule_interval(self.update, 1 / 60)
         Window.bind(on_key_down=self.on_key_down)  # キーボード入力を監視
 
     def create_blocks(self):
-        """ブロックを配置する"""
-        for row in range(5):
-            for col in range(8):
-                block = Block(80 * col + 30, Window.height - 100 - 25 * row)
-                self.blocks.append(block)
-                self.add_widget(block)
+        """今のステージのブロックを配置する"""
+        level = self.levels.get(self.level_index)
+        self.levels.prefetch(self.level_index + 1)
+        top = Window.height - 100
+        self.blocks.origin_x = 30
+        self.blocks.origin_y = top
+        self.bricks = {}
+        self.breakable = 0
+        self.brick_bottom = top - 25 * (level.rows - 1)
+        width, height = BRICK_SIZE
+        cells = level.cells
+        for row in range(level.rows):
+            for col in range(level.cols):
+                kind = BRICK_TYPES[cells[row * level.cols + col]]
+                if kind is None:
+                    continue
+                x, y = 80 * col + 30, top - 25 * row
+                block = self.brick_field.add(x, y, width, height, kind.rgba)
+                self.blocks.add(block, x, y, width, height)
+                self.bricks[block] = [kind, kind.hp, x, y]
+                if kind.hp:
+                    self.breakable += 1
+        self.brick_field.flush()
+
+    def reset_balls(self):
+        """ボールを1つだけにしてパドルの上から発射する"""
+        self.balls.clear()
+        self.particles.clear()
+        self.balls.spawn(self.paddle.center_x - BALL_SIZE / 2, self.paddle.top + 10,
+                         random.choice([-BALL_SPEED, BALL_SPEED]), BALL_SPEED,
+                         BALL_SIZE, (1, 1, 1, 1))
+
+    def split_ball(self, index):
+        """ボールを3つに分ける（マルチボール）"""
+        x, y = self.balls.pos[index]
+        vx, vy = self.balls.vel[index]
+        for angle in (-0.4, 0.4):
+            c, s = math.cos(angle), math.sin(angle)
+            self.balls.spawn(x, y, vx * c - vy * s, vx * s + vy * c, BALL_SIZE, (1, 1, 1, 1))
+
+    def burst(self, x, y, rgba):
+        """壊れたブロックの位置に破片を飛ばす"""
+        for _ in range(PARTICLES_PER_BRICK):
+            angle = random.uniform(0, 2 * math.pi)
+            speed = random.uniform(1, 4)
+            self.particles.spawn(x, y, math.cos(angle) * speed, math.sin(angle) * speed,
+                                 random.uniform(3, 6), rgba, PARTICLE_LIFE)
+
+    def hit_block(self, block, ball=None):
+        """ボールが当たったブロックの耐久を減らし、0 になったら消す"""
+        info = self.bricks[block]
+        kind, hp, x, y = info
+        if kind.hp:
+            hp -= 1
+            info[1] = hp
+        if kind.hp == 0 or hp > 0:
+            # 残るブロックはグリッドに戻す（耐久が減ったぶん暗くする）
+            self.blocks.add(block, x, y, *BRICK_SIZE)
+            if kind.hp:
+                shade = 0.4 + 0.6 * hp / kind.hp
+                r, g, b, a = kind.rgba
+                self.brick_field.set_color(block, (r * shade, g * shade, b * shade, a))
+            return
+        del self.bricks[block]
+        self.brick_field.remove(block)
+        self.breakable -= 1
+        width, height = BRICK_SIZE
+        self.burst(x + width / 2, y + height / 2, kind.rgba)
+        if kind.char == 'p' and ball is not None:
+            self.split_ball(ball)  # 紫のブロックはマルチボール
+
+    def next_level(self):
+        """次のステージへ（先読み済みなので展開待ちはない）"""
+        self.level_index = (self.level_index + 1) % len(self.levels)
+        self.blocks.clear()
+        self.brick_field.clear()
+        self.create_blocks()
+        self.reset_balls()
 
     def update(self, dt):
         """ゲームループ"""
         if not self.running:
             return
 
-        self.ball.move()
+        balls = self.balls
+        bounds = (Window.width, Window.height)
+        paddle = self.paddle
+        pos, vel = balls.pos, balls.vel
+        # ブロックやパドルに届きうるボールだけ、移動経路に沿った判定を個別に行う
+        # （壁・パドル・ブロックとの衝突はボールの移動中に解き、ブロックは
+        #   ボールが通るセルだけを調べる）
+        low = np.minimum(pos[:, 1], pos[:, 1] + vel[:, 1])
+        high = np.maximum(pos[:, 1], pos[:, 1] + vel[:, 1]) + balls.size
+        near = balls.active & ((high >= self.brick_bottom) | (low <= paddle.top))
+        paddle_rect = (paddle.x, paddle.y, paddle.width, paddle.height)
+        for index in np.flatnonzero(near):
+            x, y, vx, vy, hits = move_ball(pos[index, 0], pos[index, 1],
+                                           balls.size[index], balls.size[index],
+                                           vel[index, 0], vel[index, 1], bounds,
+                                           paddle_rect, self.blocks)
+            pos[index] = (x, y)
+            vel[index] = (vx, vy)
+            for block in hits:
+                self.hit_block(block, index)
+        # 残りのボールは移動と壁の跳ね返りをまとめて行う
+        balls.step(bounds, ~near)
+        self.particles.step(bounds)
 
-        # パドルとの衝突判定
-        if self.ball.collide_widget(self.paddle):
-            self.ball.velocity[1] *= -1
+        # 下に落ちたボールを消す
+        for index in np.flatnonzero(balls.active & (pos[:, 1] <= 0)):
+            balls.kill(index)
 
-        # ブロックとの衝突判定
-        for block in self.blocks[:]:
-            if self.ball.collide_widget(block):
-                self.blocks.remove(block)
-                block.destroy()
-                self.ball.velocity[1] *= -1
-                break
+        if not self.breakable:
+            self.next_level()
+        self.brick_field.flush()
+        self.entity_layer.flush()
 
-        # ゲームオーバー判定
-        if self.ball.y <= 0:
+        # ゲームオーバー判定（ボールがすべて落ちた）
+        if not len(balls):
             self.game_over()
 
     def game_over(self):
         """ゲームオーバー処理"""
         self.running = False
-        self.add_widget(Label(text="Game Over\nPress SPACE to Restart", font_size=40, center=(Window.width / 2, Window.height / 2)))
+        self.game_over_label = Label(text="Game Over\nPress SPACE to Restart", font_size=40, center=(Window.width / 2, Window.height / 2))
+        self.add_widget(self.game_over_label)
 
     def restart_game(self):
         """ゲームを再スタート"""
-        self.clear_widgets()
-        self.blocks = []
-        self.add_widget(self.paddle)
-        self.add_widget(self.ball)
+        # ウィジェットは作り直さず、ブロックの頂点バッファだけ書き直す
+        if self.game_over_label is not None:
+            self.remove_widget(self.game_over_label)
+            self.game_over_label = None
+        self.blocks.clear()
+        self.brick_field.clear()
 
         self.create_blocks()
-        self.ball.reset_position()
+        self.reset_balls()
         self.running = True
 
     def on_touch_move(self, touch):
@@ -0,0 +1,221 @@
+"""フレーム・区間ごとの計測（Kivyに依存しない）
+
+perf_counter_ns で測った値を固定長のリングバッファに貯めるだけなので、
+計測中もメモリは増えない。無効のときは各区間の入口で enabled を1回
+見るだけで戻る。
+
+    profiler = Profiler()
+    with profiler.section('draw'):
+        ...
+    profiler.frame()            # 描画フレームごとに1回
+    profiler.snapshot()         # 集計結果を dict で
+"""
+import gc
+import json
+from array import array
+from time import perf_counter_ns
+
+# フレーム時間ヒストグラムの区切り（ミリ秒）。最後の区間はそれ以上すべて
+FRAME_BUCKETS_MS = (8.3, 16.7, 33.3, 50.0, 100.0)
+
+
+class RingBuffer:
+    """直近 capacity 個の整数を保持する固定長バッファ"""
+    __slots__ = ('data', 'capacity', 'index', 'count')
+
+    def __init__(self, capacity=240):
+        self.data = array('q', bytes(8 * capacity))
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0  # 追加した総数
+
+    def add(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        self.count += 1
+
+    def values(self):
+        """古い順の値のリスト"""
+        if self.count < self.capacity:
+            return self.data[:self.count].tolist()
+        return self.data[self.index:].tolist() + self.data[:self.index].tolist()
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+
+def summarize(values):
+    """ナノ秒の値を平均・p95・最大（ミリ秒）にまとめる"""
+    if not values:
+        return {'n': 0, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {'n': len(ordered),
+            'mean_ms': round(sum(ordered) / len(ordered) / 1e6, 3),
+            'p95_ms': round(p95 / 1e6, 3),
+            'max_ms': round(ordered[-1] / 1e6, 3)}
+
+
+class Section:
+    """名前付きの計測区間（with で囲むか、start/stop を呼ぶ）"""
+    __slots__ = ('profiler', 'name', 'samples', 'calls', 'total_ns', '_start')
+
+    def __init__(self, profiler, name, capacity):
+        self.profiler = profiler
+        self.name = name
+        self.samples = RingBuffer(capacity)
+        self.calls = 0
+        self.total_ns = 0
+        self._start = 0
+
+    def add(self, elapsed_ns):
+        self.samples.add(elapsed_ns)
+        self.calls += 1
+        self.total_ns += elapsed_ns
+
+    def __enter__(self):
+        if self.profiler.enabled:
+            self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start:
+            self.add(perf_counter_ns() - self._start)
+            self._start = 0
+        return False
+
+    def clear(self):
+        self.samples.clear()
+        self.calls = 0
+        self.total_ns = 0
+
+
+class Profiler:
+    """フレーム時間・区間ごとの処理時間・GC回数をまとめて測る"""
+    def __init__(self, capacity=240, enabled=False):
+        self.capacity = capacity
+        self.sections = {}
+        self.frame_times = RingBuffer(capacity)
+        self.histogram = [0] * (len(FRAME_BUCKETS_MS) + 1)
+        self.gauges = {}  # 描画命令数など、外から与える瞬間値
+        self.gc_collections = [0, 0, 0]  # 世代ごとの回収回数
+        self._last_frame = 0
+        self._gc_marks = []  # (時刻ns, 回収回数合計)。GC回数/秒の計算用
+        self.enabled = False
+        if enabled:
+            self.enable()
+
+    def section(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = Section(self, name, self.capacity)
+        return section
+
+    def wrap(self, name, func):
+        """func を呼ぶたびに name の区間として測る関数を返す"""
+        section = self.section(name)
+
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                section.add(perf_counter_ns() - start)
+        timed.__wrapped__ = func
+        return timed
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self._last_frame = 0
+            gc.callbacks.append(self._on_gc)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            if self._on_gc in gc.callbacks:
+                gc.callbacks.remove(self._on_gc)
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def reset(self):
+        for section in self.sections.values():
+            section.clear()
+        self.frame_times.clear()
+        self.histogram = [0] * len(self.histogram)
+        self.gc_collections = [0, 0, 0]
+        self._gc_marks = []
+        self._last_frame = 0
+
+    def _on_gc(self, phase, info):
+        if phase == 'stop':
+            self.gc_collections[info['generation']] += 1
+
+    def frame(self):
+        """描画フレームの先頭で呼ぶ（前回からの間隔をフレーム時間とする）"""
+        if not self.enabled:
+            return
+        now = perf_counter_ns()
+        last = self._last_frame
+        self._last_frame = now
+        if not last:
+            return
+        elapsed = now - last
+        self.frame_times.add(elapsed)
+        elapsed_ms = elapsed / 1e6
+        for i, limit in enumerate(FRAME_BUCKETS_MS):
+            if elapsed_ms < limit:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def fps(self):
+        """直近のフレーム時間から求めた平均FPS"""
+        values = self.frame_times.values()
+        if not values:
+            return 0.0
+        return len(values) * 1e9 / sum(values)
+
+    def gc_rate(self):
+        """前回呼んだときからの GC 回数/秒"""
+        now = perf_counter_ns()
+        total = sum(self.gc_collections)
+        self._gc_marks.append((now, total))
+        if len(self._gc_marks) > 2:
+            self._gc_marks.pop(0)
+        if len(self._gc_marks) < 2:
+            return 0.0
+        (t0, c0), (t1, c1) = self._gc_marks
+        return (c1 - c0) * 1e9 / max(t1 - t0, 1)
+
+    def snapshot(self):
+        """集計結果（JSON にそのまま書ける dict）"""
+        labels = [f'<{limit}ms' for limit in FRAME_BUCKETS_MS]
+        labels.append(f'>={FRAME_BUCKETS_MS[-1]}ms')
+        return {
+            'fps': round(self.fps(), 1),
+            'frames': summarize(self.frame_times.values()),
+            'frame_histogram': dict(zip(labels, self.histogram)),
+            'sections': {name: dict(summarize(section.samples.values()),
+                                    calls=section.calls,
+                                    total_ms=round(section.total_ns / 1e6, 3))
+                         for name, section in self.sections.items()},
+            'gauges': dict(self.gauges),
+            'gc_collections': list(self.gc_collections),
+        }
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
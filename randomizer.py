@@ -0,0 +1,125 @@
+"""ミノの出現順を決めるランダマイザと先読みキュー（Kivyに依存しない）
+
+乱数はシードから決定的に動く小さな xorshift64* を使う。状態が整数1つなので
+リプレイやスナップショットに丸ごと保存できる。出現順の方式は
+'bag7'（7種を1袋ずつ）・'history'（直近4個を避ける）・'random' から選ぶ。
+"""
+from tetromino import PIECES, PIECES_BY_NAME
+
+MASK64 = (1 << 64) - 1
+
+
+class Rng:
+    """xorshift64* 乱数"""
+    __slots__ = ('state',)
+
+    def __init__(self, seed=0):
+        self.seed(seed)
+
+    def seed(self, seed):
+        # splitmix64 で種をかき混ぜる（0 の状態は xorshift では使えない）
+        z = (seed + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        self.state = (z ^ (z >> 31)) or 1
+
+    def next64(self):
+        x = self.state
+        x ^= x >> 12
+        x ^= (x << 25) & MASK64
+        x ^= x >> 27
+        self.state = x
+        return (x * 0x2545F4914F6CDD1D) & MASK64
+
+    def below(self, n):
+        """0 以上 n 未満の整数"""
+        return ((self.next64() >> 32) * n) >> 32
+
+    def shuffle(self, items):
+        for i in range(len(items) - 1, 0, -1):
+            j = self.below(i + 1)
+            items[i], items[j] = items[j], items[i]
+
+
+class PureRandom:
+    """毎回7種から一様に選ぶ"""
+    name = 'random'
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def next(self):
+        return self.rng.below(len(PIECES))
+
+
+class SevenBag:
+    """7種を1つずつ入れた袋をシャッフルして順に出す"""
+    name = 'bag7'
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.bag = []  # 袋の残り（末尾から取り出す）
+
+    def next(self):
+        if not self.bag:
+            self.bag = list(range(len(PIECES)))
+            self.rng.shuffle(self.bag)
+        return self.bag.pop()
+
+
+class HistoryRandomizer:
+    """直近 history 個と同じミノを tries 回まで引き直す（TGM 方式）"""
+    name = 'history'
+
+    def __init__(self, rng, history=4, tries=6):
+        self.rng = rng
+        self.tries = tries
+        # 序盤に S/Z が続かないよう、履歴を S/Z で埋めておく
+        start = [PIECES_BY_NAME['Z'].index, PIECES_BY_NAME['S'].index]
+        self.history = [start[i % 2] for i in range(history)]
+
+    def next(self):
+        count = len(PIECES)
+        piece = self.rng.below(count)
+        for _ in range(self.tries - 1):
+            if piece not in self.history:
+                break
+            piece = self.rng.below(count)
+        self.history.pop(0)
+        self.history.append(piece)
+        return piece
+
+
+RANDOMIZERS = {cls.name: cls for cls in (SevenBag, HistoryRandomizer, PureRandom)}
+# リプレイなどに保存するときの番号
+RANDOMIZER_CODES = {'bag7': 0, 'history': 1, 'random': 2}
+
+
+def make_randomizer(name, rng):
+    return RANDOMIZERS[name](rng)
+
+
+class PieceQueue:
+    """次に出るミノを固定長のリングバッファで先読みしておくキュー"""
+    def __init__(self, randomizer, size=5):
+        self.randomizer = randomizer
+        self.size = size
+        self._items = [randomizer.next() for _ in range(size)]
+        self._head = 0
+        self.version = 0  # 中身が変わるたびに増える（プレビューの更新判定用）
+
+    def pop(self):
+        """先頭を取り出し、空いた枠を新しいミノで埋める（O(1)）"""
+        head = self._head
+        piece = self._items[head]
+        self._items[head] = self.randomizer.next()
+        self._head = (head + 1) % self.size
+        self.version += 1
+        return piece
+
+    def peek(self, count=None):
+        """これから出るミノの番号を先頭から count 個"""
+        if count is None or count > self.size:
+            count = self.size
+        items, head, size = self._items, self._head, self.size
+        return [items[(head + i) % size] for i in range(count)]
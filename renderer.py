@@ -0,0 +1,238 @@
+"""ゲームボードの差分描画
+
+グリッドはリサイズ時に一度だけ作り、盤面の各マスには Color/Rectangle の
+組を1つずつ常駐させる。毎回の描画では色が変わるマスだけを書き換える。
+MeshRenderer は同じ差分を1つの Mesh の頂点バッファに書き込む。
+"""
+from array import array
+
+from kivy.graphics import Color, Rectangle, Line, InstructionGroup, Mesh, RenderContext
+
+# マスの状態
+EMPTY = 0
+LOCKED = 1
+CLEARING = 2
+ACTIVE = 3
+GHOST = 4
+
+# 状態ごとの色（空マスは透明にしてグリッドを見せる）
+STATE_COLORS = {
+    EMPTY: (0, 0, 0, 0),
+    LOCKED: (0.6, 0.6, 0.9, 1),
+    CLEARING: (1, 1, 0, 1),  # ライン消去前のハイライト色
+    ACTIVE: (0.8, 0.4, 0.4, 1),
+    GHOST: (0.8, 0.4, 0.4, 0.3),  # 着地予定位置
+}
+GRID_COLOR = (0.3, 0.3, 0.3)
+
+
+def board_origin(widget, cols, rows):
+    """ボードを中央に配置したときの左下座標とマスの大きさ"""
+    cell_size = min(widget.width / cols, widget.height / rows)
+    x0 = widget.x + (widget.width - cell_size * cols) / 2
+    y0 = widget.y + (widget.height - cell_size * rows) / 2
+    return x0, y0, cell_size
+
+
+def active_cells(piece, cols, rows, y=None):
+    """落下中のミノが占めるマス番号（盤面外は除く）。y を渡すとその行に置いたとき"""
+    px, py = piece.x, piece.y if y is None else y
+    return {(py + dy) * cols + px + dx for dx, dy in piece.cells
+            if 0 <= py + dy < rows and 0 <= px + dx < cols}
+
+
+class _CellRenderer:
+    """マスの状態を覚えておき、変化したマスだけ _paint に渡す共通部分"""
+    def __init__(self, canvas, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.grid = InstructionGroup()
+        canvas.add(self.grid)
+        self._states = [EMPTY] * (cols * rows)
+        self._active = set()
+        self._ghost = set()
+        self._clearing = set()
+
+    def _build_grid(self, x0, y0, cell):
+        cols, rows = self.cols, self.rows
+        board_width = cell * cols
+        board_height = cell * rows
+        self.grid.clear()
+        self.grid.add(Color(*GRID_COLOR))
+        for i in range(cols + 1):
+            self.grid.add(Line(points=[x0 + i * cell, y0, x0 + i * cell, y0 + board_height]))
+        for j in range(rows + 1):
+            self.grid.add(Line(points=[x0, y0 + j * cell, x0 + board_width, y0 + j * cell]))
+
+    def update(self, board, piece, clearing_lines=(), ghost_y=None):
+        """盤面の変化行・ミノとゴーストの移動前後・ハイライト行だけ塗り直す"""
+        cols = self.cols
+        candidates = set()
+        for y in board.take_dirty_rows():
+            candidates.update(range(y * cols, (y + 1) * cols))
+
+        clearing = set(clearing_lines)
+        for y in clearing ^ self._clearing:
+            candidates.update(range(y * cols, (y + 1) * cols))
+        self._clearing = clearing
+
+        active = active_cells(piece, cols, self.rows) if piece else set()
+        candidates |= active ^ self._active
+        self._active = active
+
+        ghost = set()
+        if piece and ghost_y is not None and ghost_y != piece.y:
+            ghost = active_cells(piece, cols, self.rows, ghost_y) - active
+        candidates |= ghost ^ self._ghost
+        self._ghost = ghost
+
+        cells = board.cells
+        states = self._states
+        changed = False
+        for index in candidates:
+            y, x = divmod(index, cols)
+            if index in active:
+                state = ACTIVE
+            elif index in ghost:
+                state = GHOST
+            elif (cells[y] >> x) & 1:
+                state = CLEARING if y in clearing else LOCKED
+            else:
+                state = EMPTY
+            if states[index] != state:
+                states[index] = state
+                self._paint(index, state)
+                changed = True
+        if changed:
+            self._flush()
+
+    def _paint(self, index, state):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+
+class BoardRenderer(_CellRenderer):
+    """マスごとの Rectangle を使い回して変化したマスだけ更新する"""
+    def __init__(self, canvas, cols, rows):
+        super().__init__(canvas, cols, rows)
+        self.cell_group = InstructionGroup()
+        canvas.add(self.cell_group)
+
+        self._colors = []
+        self._rects = []
+        for _ in range(cols * rows):
+            color = Color(*STATE_COLORS[EMPTY])
+            rect = Rectangle(pos=(0, 0), size=(0, 0))
+            self.cell_group.add(color)
+            self.cell_group.add(rect)
+            self._colors.append(color)
+            self._rects.append(rect)
+
+    def resize(self, widget):
+        """グリッドを作り直し、全マスの位置を合わせる"""
+        cols, rows = self.cols, self.rows
+        x0, y0, cell = board_origin(widget, cols, rows)
+        self._build_grid(x0, y0, cell)
+        for index, rect in enumerate(self._rects):
+            y, x = divmod(index, cols)
+            rect.pos = (x0 + x * cell, y0 + (rows - y - 1) * cell)
+            rect.size = (cell, cell)
+
+    def _paint(self, index, state):
+        self._colors[index].rgba = STATE_COLORS[state]
+
+
+# 頂点ごとに色を持たせるためのシェーダー
+# shader.source はファイル名を取るので、文字列は vs / fs として同時に渡す
+MESH_VERTEX_SHADER = """
+#ifdef GL_ES
+    precision highp float;
+#endif
+attribute vec2 vPosition;
+attribute vec4 vColor;
+uniform mat4 modelview_mat;
+uniform mat4 projection_mat;
+varying vec4 frag_color;
+
+void main(void) {
+    frag_color = vColor;
+    gl_Position = projection_mat * modelview_mat * vec4(vPosition, 0.0, 1.0);
+}
+"""
+MESH_FRAGMENT_SHADER = """
+#ifdef GL_ES
+    precision mediump float;
+#endif
+varying vec4 frag_color;
+
+void main(void) {
+    gl_FragColor = frag_color;
+}
+"""
+MESH_FORMAT = [(b'vPosition', 2, 'float'), (b'vColor', 4, 'float')]
+VERTEX_SIZE = 6  # x, y, r, g, b, a
+QUAD_SIZE = VERTEX_SIZE * 4
+_STATE_RGBA = {state: array('f', rgba) for state, rgba in STATE_COLORS.items()}
+
+
+class MeshRenderer(_CellRenderer):
+    """全マスを1つの Mesh にまとめ、頂点バッファの色をその場で書き換える"""
+    def __init__(self, canvas, cols, rows):
+        super().__init__(canvas, cols, rows)
+        count = cols * rows
+        self._vertices = array('f', [0.0] * (count * QUAD_SIZE))
+        indices = array('H')
+        for i in range(count):
+            base = i * 4
+            indices.extend((base, base + 1, base + 2, base + 2, base + 3, base))
+        self.context = RenderContext(vs=MESH_VERTEX_SHADER, fs=MESH_FRAGMENT_SHADER,
+                                     use_parent_projection=True,
+                                     use_parent_modelview=True)
+        self.mesh = Mesh(vertices=self._vertices, indices=indices,
+                         fmt=MESH_FORMAT, mode='triangles')
+        self.context.add(self.mesh)
+        canvas.add(self.context)
+
+    def resize(self, widget):
+        """グリッドを作り直し、全マスの頂点座標を書き直す"""
+        cols, rows = self.cols, self.rows
+        x0, y0, cell = board_origin(widget, cols, rows)
+        self._build_grid(x0, y0, cell)
+        vertices = self._vertices
+        for index in range(cols * rows):
+            y, x = divmod(index, cols)
+            left = x0 + x * cell
+            bottom = y0 + (rows - y - 1) * cell
+            corners = ((left, bottom), (left + cell, bottom),
+                       (left + cell, bottom + cell), (left, bottom + cell))
+            offset = index * QUAD_SIZE
+            for vx, vy in corners:
+                vertices[offset] = vx
+                vertices[offset + 1] = vy
+                offset += VERTEX_SIZE
+        self._flush()
+
+    def _paint(self, index, state):
+        vertices = self._vertices
+        rgba = _STATE_RGBA[state]
+        offset = index * QUAD_SIZE + 2
+        for _ in range(4):
+            vertices[offset:offset + 4] = rgba
+            offset += VERTEX_SIZE
+
+    def _flush(self):
+        # 同じバッファを代入し直して GPU へ転送させる
+        self.mesh.vertices = self._vertices
+
+
+RENDERERS = {
+    'rect': BoardRenderer,
+    'mesh': MeshRenderer,
+}
+
+
+def make_renderer(mode, canvas, cols, rows):
+    """描画方式を名前で選ぶ（'rect' = マスごとの Rectangle, 'mesh' = 単一 Mesh）"""
+    return RENDERERS[mode](canvas, cols, rows)
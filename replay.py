@@ -0,0 +1,185 @@
+"""リプレイの記録と再生（Kivyに依存しない）
+
+シードと「何tick目にどの操作をしたか」だけを小さなバイナリ形式で保存する。
+エンジンは固定タイムステップでシードから決定的に動くので、これだけで
+同じゲームを最大速度で再実行したり、画面上で再生したりできる。
+
+ファイル形式（数値はすべて可変長整数 varint）:
+    b'TRPL' バージョン(1バイト) シード 列数 行数 開始レベル ランダマイザ番号
+    [前の操作からのtick差分 操作コード(1バイト)] ...
+    最終tickまでの差分 END(0xFF)
+
+    python replay.py last_replay.trpl   # ヘッドレスで最大速度で再生
+"""
+import sys
+from time import perf_counter
+
+from engine import TetrisEngine
+from randomizer import RANDOMIZER_CODES
+
+MAGIC = b'TRPL'
+VERSION = 3  # ルールが変わって再現できなくなったら上げる
+END = 0xFF
+
+
+def write_varint(out, value):
+    """0以上の整数を7ビットずつ書き出す"""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def read_varint(data, pos):
+    """(値, 次の位置) を返す"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    """1ゲーム分のリプレイ"""
+    def __init__(self, seed, cols=10, rows=20, start_level=0, events=None, total_ticks=0,
+                 randomizer='bag7'):
+        self.seed = seed
+        self.cols = cols
+        self.rows = rows
+        self.start_level = start_level
+        self.randomizer = randomizer
+        self.events = events if events is not None else []  # (tick, 操作) のリスト
+        self.total_ticks = total_ticks
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        for value in (self.seed, self.cols, self.rows, self.start_level,
+                      RANDOMIZER_CODES[self.randomizer]):
+            write_varint(out, value)
+        last = 0
+        for tick, action in self.events:
+            write_varint(out, tick - last)
+            out.append(action)
+            last = tick
+        write_varint(out, max(self.total_ticks - last, 0))
+        out.append(END)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError('not a replay file')
+        if data[4] != VERSION:
+            raise ValueError(f'unsupported replay version: {data[4]}')
+        pos = 5
+        header = []
+        for _ in range(5):
+            value, pos = read_varint(data, pos)
+            header.append(value)
+        events = []
+        tick = 0
+        while True:
+            delta, pos = read_varint(data, pos)
+            tick += delta
+            action = data[pos]
+            pos += 1
+            if action == END:
+                break
+            events.append((tick, action))
+        seed, cols, rows, start_level, code = header
+        names = {value: name for name, value in RANDOMIZER_CODES.items()}
+        return cls(seed, cols, rows, start_level, events, tick, names[code])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def make_engine(self, **kwargs):
+        """記録時と同じ条件のエンジンを作る"""
+        return TetrisEngine(self.cols, self.rows, seed=self.seed,
+                            start_level=self.start_level,
+                            randomizer=self.randomizer, **kwargs)
+
+
+class ReplayRecorder:
+    """TetrisEngine.step に渡された操作を記録する"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.replay = Replay(engine.seed, engine.cols, engine.rows, engine.start_level,
+                             randomizer=engine.randomizer)
+        engine.recorder = self
+
+    def record(self, tick, action):
+        self.replay.events.append((tick, action))
+
+    def finish(self):
+        """記録を終えてリプレイを返す"""
+        self.replay.total_ticks = self.engine.ticks
+        if self.engine.recorder is self:
+            self.engine.recorder = None
+        return self.replay
+
+
+class ReplayPlayer:
+    """リプレイの操作を tick に合わせてエンジンへ流し込む"""
+    def __init__(self, replay):
+        self.replay = replay
+        self.index = 0
+
+    @property
+    def finished(self):
+        return self.index >= len(self.replay.events)
+
+    def apply_due(self, engine):
+        """今の tick で行われた操作をすべて適用する。適用したら True"""
+        events = self.replay.events
+        applied = False
+        while self.index < len(events) and events[self.index][0] <= engine.ticks:
+            engine.step(events[self.index][1])
+            self.index += 1
+            applied = True
+        return applied
+
+    def run(self, engine=None):
+        """描画なしで最後まで最大速度で再生し、エンジンを返す"""
+        if engine is None:
+            engine = self.replay.make_engine()
+        total = self.replay.total_ticks
+        while not engine.is_game_over:
+            self.apply_due(engine)
+            if engine.ticks >= total and self.finished:
+                break
+            engine.tick()
+        return engine
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f'usage: {argv[0]} REPLAY_FILE')
+        return 2
+    replay = Replay.load(argv[1])
+    start = perf_counter()
+    engine = ReplayPlayer(replay).run()
+    elapsed = perf_counter() - start
+    print(f'seed={replay.seed} ticks={engine.ticks} pieces={engine.pieces} '
+          f'lines={engine.lines} score={engine.score} game_over={engine.is_game_over}')
+    print(f'{elapsed * 1000:.1f} ms ({engine.ticks / max(elapsed, 1e-9):.0f} ticks/s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
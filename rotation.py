@@ -0,0 +1,58 @@
+"""SRS（スーパーローテーションシステム）の回転と壁蹴り（Kivyに依存しない）
+
+壁蹴りの候補は (ミノ, 回転前, 回転後) ごとにタプルで前計算しておき、
+判定は BitBoard.collides の高速経路をそのまま使う。
+"""
+from tetromino import PIECES
+
+# SRS の壁蹴り表（y は上向きが正の公式表記）。キーは (回転前, 回転後)
+_JLSTZ_KICKS = {
+    (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+}
+_I_KICKS = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+}
+_O_KICKS = {key: ((0, 0),) for key in _JLSTZ_KICKS}
+
+
+def _kick_table(piece):
+    if piece.name == 'I':
+        table = _I_KICKS
+    elif piece.name == 'O':
+        table = _O_KICKS
+    else:
+        table = _JLSTZ_KICKS
+    # 盤面は y が下向きなので符号を反転しておく
+    return tuple(
+        tuple(tuple((dx, -dy) for dx, dy in table.get((src, dst), ()))
+              for dst in range(4))
+        for src in range(4))
+
+
+# KICKS[ミノ番号][回転前][回転後] = ((dx, dy), ...)（盤面の向き）
+KICKS = tuple(_kick_table(piece) for piece in PIECES)
+
+
+def rotate(board, kind, rotation, x, y, left=False):
+    """回転できれば (新しい回転, x, y)、どの候補も重なるなら None"""
+    new_rotation = (rotation - 1) % 4 if left else (rotation + 1) % 4
+    masks, lo, hi = kind.masks[new_rotation]
+    collides = board.collides
+    for dx, dy in KICKS[kind.index][rotation][new_rotation]:
+        if not collides(masks, lo, hi, x + dx, y + dy):
+            return new_rotation, x + dx, y + dy
+    return None
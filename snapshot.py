@@ -0,0 +1,249 @@
+"""プレイ途中のゲームの保存と復元（Kivyに依存しない）
+
+盤面の行マスク・落下中のミノ・乱数とキューの状態・スコアとタイマーを
+小さなバイナリにまとめる。10×20 の盤面で 100 バイト前後。復元すると
+エンジンは保存した時点から同じ乱数列・同じミノ順で続きを進める。
+
+ファイル形式（特記なければ varint、符号付きは zigzag の varint）:
+    b'TSNP' バージョン(1バイト) 列数 行数 開始レベル ランダマイザ番号 シード
+    tick数 スコア ライン数 ミノ数 レベル 落下量 接地tick数 猶予リセット回数
+    消去待ちtick数 ゲームオーバー(0/1)
+    乱数の状態(8バイト) ランダマイザの状態（bag7: 袋, history: 履歴。個数+1バイトずつ）
+    キュー: 先頭位置 更新回数 個数 [ミノ番号(1バイト)] ...
+    ミノ: 種類(1バイト) 回転(1バイト) x(符号付き) y(符号付き) 最低到達行(符号付き)
+    消去待ちの行: 個数 [行番号] ...
+    盤面: 行ごとの行マスク（(列数+7)//8 バイト、リトルエンディアン）× 行数
+
+    data = capture(engine)           # bytes
+    restore(engine, data)            # 同じエンジンをその時点に戻す
+    save_async(data, path)           # 裏のスレッドで書き換え（途中で落ちても壊れない）
+
+テストで「天井近くまで積もった盤面」などから始めたいときも、保存しておいた
+スナップショットを restore すれば遊んでたどり着く必要がない。
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import GRAVITY_TABLE
+from randomizer import RANDOMIZER_CODES, PieceQueue, make_randomizer
+from replay import write_varint, read_varint
+from tetromino import PIECES, ActivePiece
+
+MAGIC = b'TSNP'
+VERSION = 1  # 形式やルールが変わって続きを再現できなくなったら上げる
+
+_NAMES = {code: name for name, code in RANDOMIZER_CODES.items()}
+_writer = None  # 書き込み用のスレッド（1本なので書き込み順が入れ替わらない）
+_writer_lock = threading.Lock()
+
+
+def _write_signed(out, value):
+    write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _read_signed(data, pos):
+    value, pos = read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _write_bytes(out, values):
+    write_varint(out, len(values))
+    out.extend(values)
+
+
+def _read_bytes(data, pos):
+    count, pos = read_varint(data, pos)
+    return list(data[pos:pos + count]), pos + count
+
+
+def _randomizer_state(randomizer):
+    # 乱数以外に持っている状態（PureRandom は何も持たない）
+    if randomizer.name == 'bag7':
+        return randomizer.bag
+    if randomizer.name == 'history':
+        return randomizer.history
+    return []
+
+
+def capture(engine):
+    """エンジンの今の状態をスナップショットの bytes にする"""
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    for value in (engine.cols, engine.rows, engine.start_level,
+                  RANDOMIZER_CODES[engine.randomizer], engine.seed,
+                  engine.ticks, engine.score, engine.lines, engine.pieces, engine.level,
+                  engine.gravity_units, engine.lock_counter, engine.lock_resets,
+                  engine.clear_timer, int(engine.is_game_over)):
+        write_varint(out, value)
+    out += engine.rng.state.to_bytes(8, 'little')
+    queue = engine.queue
+    _write_bytes(out, _randomizer_state(queue.randomizer))
+    write_varint(out, queue._head)
+    write_varint(out, queue.version)
+    _write_bytes(out, queue._items)
+    piece = engine.current_piece
+    out.append(piece.kind.index)
+    out.append(piece.rotation)
+    for value in (piece.x, piece.y, engine.lowest_y):
+        _write_signed(out, value)
+    _write_bytes(out, engine.clearing_lines)
+    width = (engine.cols + 7) // 8
+    for row in engine.board.cells:
+        out += row.to_bytes(width, 'little')
+    return bytes(out)
+
+
+def _parse(data, cols, rows):
+    """スナップショットを読んで値を確かめる。おかしければ ValueError"""
+    if data[:4] != MAGIC:
+        raise ValueError('not a snapshot file')
+    if len(data) < 5 or data[4] != VERSION:
+        raise ValueError(f'unsupported snapshot version: {data[4:5]!r}')
+    pos = 5
+    try:
+        header = []
+        for _ in range(15):
+            value, pos = read_varint(data, pos)
+            header.append(value)
+        if (header[0], header[1]) != (cols, rows):
+            raise ValueError(f'snapshot is for a {header[0]}x{header[1]} board')
+        if len(data) < pos + 8:
+            raise IndexError
+        rng_state = int.from_bytes(data[pos:pos + 8], 'little')
+        pos += 8
+        randomizer_state, pos = _read_bytes(data, pos)
+        head, pos = read_varint(data, pos)
+        version, pos = read_varint(data, pos)
+        items, pos = _read_bytes(data, pos)
+        kind, rotation = data[pos], data[pos + 1]
+        pos += 2
+        x, pos = _read_signed(data, pos)
+        y, pos = _read_signed(data, pos)
+        lowest_y, pos = _read_signed(data, pos)
+        clearing_lines, pos = _read_bytes(data, pos)
+    except IndexError:
+        raise ValueError('truncated snapshot') from None
+    width = (cols + 7) // 8
+    if len(data) != pos + width * rows:
+        raise ValueError('truncated snapshot' if len(data) < pos + width * rows
+                         else 'trailing bytes after the board')
+    cells = [int.from_bytes(data[pos + i * width:pos + (i + 1) * width], 'little')
+             for i in range(rows)]
+
+    code = header[3]
+    if code not in _NAMES:
+        raise ValueError(f'unknown randomizer code: {code}')
+    if _NAMES[code] == 'history' and not randomizer_state:
+        raise ValueError('history randomizer without a history')
+    if not rng_state:
+        raise ValueError('random state is zero')
+    if any(value >= len(PIECES) for value in randomizer_state + items):
+        raise ValueError('piece number out of range')
+    if not items or head >= len(items):
+        raise ValueError('piece queue is empty or its head is out of range')
+    if kind >= len(PIECES) or rotation >= 4:
+        raise ValueError(f'bad active piece: kind {kind}, rotation {rotation}')
+    if any(line >= rows for line in clearing_lines):
+        raise ValueError('clearing row out of range')
+    full_row = (1 << cols) - 1
+    if any(row > full_row for row in cells):
+        raise ValueError('row mask wider than the board')
+    return (header, rng_state, randomizer_state, head, version, items,
+            kind, rotation, x, y, lowest_y, clearing_lines, cells)
+
+
+def restore(engine, data):
+    """スナップショットの状態にエンジンを戻す（エンジンは作り直さない）
+
+    読めないデータなら ValueError を投げ、エンジンには何も書き込まない。
+    """
+    (header, rng_state, randomizer_state, head, version, items,
+     kind, rotation, x, y, lowest_y, clearing_lines, cells) = _parse(data, engine.cols, engine.rows)
+    (cols, rows, start_level, code, seed, ticks, score, lines, pieces, level,
+     gravity_units, lock_counter, lock_resets, clear_timer, game_over) = header
+
+    # 乱数とキュー（作るときに乱数を進めるので、状態は最後に上書きする）
+    engine.randomizer = _NAMES[code]
+    engine.start_level = start_level
+    engine.seed = seed
+    engine._next_seed = None
+    randomizer = make_randomizer(engine.randomizer, engine.rng)
+    engine.queue = PieceQueue(randomizer, len(items))
+    engine.rng.state = rng_state
+    if randomizer.name == 'bag7':
+        randomizer.bag = randomizer_state
+    elif randomizer.name == 'history':
+        randomizer.history = randomizer_state
+    engine.queue._items = items
+    engine.queue._head = head
+    engine.queue.version = version
+
+    engine.board.load(cells)
+    engine.rotation_cache = {}
+    engine.clearing_lines = clearing_lines
+    engine.ticks = ticks
+    engine.score = score
+    engine.lines = lines
+    engine.pieces = pieces
+    engine.level = level
+    engine.gravity = GRAVITY_TABLE[min(level, len(GRAVITY_TABLE) - 1)]
+    engine.gravity_units = gravity_units
+    engine.clear_timer = clear_timer
+    engine.is_game_over = bool(game_over)
+    engine.current_piece = ActivePiece(PIECES[kind], rotation, x, y)
+    engine.lock_counter = lock_counter
+    engine.lock_resets = lock_resets
+    engine.lowest_y = lowest_y
+    return engine
+
+
+def write_atomic(data, path):
+    """一時ファイルに書いてから置き換える（途中で落ちても前のファイルが残る）"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _submit(func, *args):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot')
+    return _writer.submit(func, *args)
+
+
+def save_async(data, path):
+    """書き込み用のスレッドで write_atomic する。Future を返す"""
+    return _submit(write_atomic, data, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_async(path):
+    """保存したスナップショットを消す（save_async と同じスレッドで順番に）"""
+    return _submit(_remove, path)
+
+
+def flush():
+    """それまでに頼んだ書き込み・削除が終わるまで待つ"""
+    if _writer is not None:
+        _submit(lambda: None).result()
+
+
+def load(path):
+    """保存したスナップショットの bytes（なければ None）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
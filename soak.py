@@ -0,0 +1,266 @@
+"""たくさんのゲームを並列に回す耐久テスト（Kivyに依存しない）
+
+シードを決めたゲームを ProcessPoolExecutor で CPU コアに振り分け、
+ランダム入力またはボットで最後まで遊ばせる。GameBoard と同じく
+FixedStepLoop で tick を進め、フレーム時間のばらつきや一時停止・再開も
+混ぜる。一定tickごとに盤面の整合性を確かめ、例外が出たら
+トレースバックとリプレイを残す。
+
+    python soak.py --games 2000                 # ランダム入力で2000ゲーム
+    python soak.py --games 200 --input bot      # ボットで
+    python soak.py --seed 7 --game 123          # 1ゲームだけ再実行（再現用）
+
+ゲームのシードは (--seed, ゲーム番号) から決まるので、シャードの数や
+実行順が変わっても同じゲームは同じ結果になる。
+"""
+import argparse
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from bot import Bot
+from engine import (TetrisEngine, TICK_RATE, NONE, MOVE_LEFT, MOVE_RIGHT, ROTATE_LEFT,
+                    ROTATE_RIGHT, HARD_DROP, GRAVITY)
+from gameloop import FixedStepLoop
+from perf import Profiler
+from randomizer import Rng
+from replay import ReplayRecorder
+
+# ランダム入力の操作と重み（何もしないフレームが多い）
+RANDOM_ACTIONS = (NONE, MOVE_LEFT, MOVE_RIGHT, ROTATE_RIGHT, ROTATE_LEFT, HARD_DROP, GRAVITY)
+RANDOM_WEIGHTS = (24, 3, 3, 2, 2, 1, 1)
+PAUSE_CHANCE = 500  # 1フレームあたり 1/PAUSE_CHANCE の確率で一時停止・再開を切り替える
+BOT_INTERVAL_TICKS = 4  # game_ui と同じ間隔でボットを動かす
+MAX_TICKS = 200000  # 1ゲームの上限（ボットが終わらない場合の打ち切り）
+
+
+def game_seed(base, index):
+    """(基準シード, ゲーム番号) からゲームのシードを決める"""
+    return Rng(base * 1000003 + index).next64() & 0xFFFFFFFF
+
+
+def check_invariants(engine):
+    """盤面とミノの状態が矛盾していないか確かめる（矛盾していれば AssertionError）"""
+    board = engine.board
+    heights = list(board.heights)
+    board._recompute_heights()
+    assert heights == board.heights, f'heights out of sync: {heights} != {board.heights}'
+    assert all(0 <= row <= board.full_row for row in board.cells), 'row mask out of range'
+    assert set(engine.clearing_lines) <= set(board.full_lines()), 'clearing a row that is not full'
+    if not engine.is_game_over and not engine.clearing_lines:
+        assert engine.can_move(0, 0), 'active piece overlaps the stack'
+
+
+class SoakBoard:
+    """GameBoard の進め方（固定ステップ・一時停止・ボット）を描画なしで再現する"""
+    def __init__(self, seed, mode='random', profiler=None):
+        self.engine = TetrisEngine(seed=seed)
+        self.recorder = ReplayRecorder(self.engine)
+        if profiler is not None:
+            self.engine.lock_piece = profiler.wrap('lock_piece', self.engine.lock_piece)
+            self.engine.clear_lines = profiler.wrap('clear_lines', self.engine.clear_lines)
+        self.bot = Bot(self.engine) if mode == 'bot' else None
+        self.rng = Rng(seed ^ 0x5EED)  # 入力・フレーム時間・一時停止用（ゲームの乱数とは別）
+        self.is_paused = False
+        self.pauses = 0
+        self.loop = FixedStepLoop(self.tick, self.render, tick_rate=TICK_RATE)
+
+    def tick(self):
+        if self.is_paused or self.engine.is_game_over:
+            return False
+        moved = False
+        if self.bot and self.engine.ticks % BOT_INTERVAL_TICKS == 0:
+            self.engine.step(self.bot.next_action())
+            moved = True
+        return self.engine.tick() or moved
+
+    def render(self):
+        pass
+
+    def frame(self):
+        """描画フレーム1回分（入力 → 一時停止の切り替え → ループを進める）"""
+        rng = self.rng
+        engine = self.engine
+        if not self.bot and not self.is_paused:
+            action = _choose_random(rng)
+            if action != NONE:
+                engine.step(action)
+        if rng.below(PAUSE_CHANCE) == 0:
+            self.toggle_pause()
+        ticks = engine.ticks
+        # 8〜40ms のばらついたフレーム時間（遅れたフレームで max_steps の打ち切りも通る）
+        steps = self.loop.advance((8 + rng.below(33)) / 1000)
+        assert steps <= self.loop.max_steps, 'loop ran more ticks than max_steps'
+        if self.is_paused:
+            assert engine.ticks == ticks, 'engine ticked while paused'
+
+    def toggle_pause(self):
+        if self.is_paused:
+            self.is_paused = False
+            self.loop.reset()  # GameBoard.resume_game と同じく貯まった時間を捨てる
+        else:
+            self.is_paused = True
+            self.pauses += 1
+
+
+def _choose_random(rng):
+    pick = rng.below(sum(RANDOM_WEIGHTS))
+    for action, weight in zip(RANDOM_ACTIONS, RANDOM_WEIGHTS):
+        if pick < weight:
+            return action
+        pick -= weight
+    return NONE
+
+
+def play_game(board, max_pieces=None, check_every=60):
+    """ゲームオーバー（または max_pieces 個）まで遊ばせる。例外はそのまま投げる
+
+    1フレームで進む tick 数はばらつくので、check_every tick の区切りを
+    またいだフレームの後で確かめる（一時停止中は tick が進まないので確かめない）。
+    """
+    engine = board.engine
+    next_check = check_every
+    while not engine.is_game_over and engine.ticks < MAX_TICKS:
+        if max_pieces is not None and engine.pieces >= max_pieces:
+            break
+        board.frame()
+        if check_every and engine.ticks >= next_check:
+            check_invariants(engine)
+            next_check = (engine.ticks // check_every + 1) * check_every
+    check_invariants(engine)
+    return engine
+
+
+def run_shard(base_seed, indices, mode, max_pieces, check_every, failure_dir):
+    """ワーカープロセスで indices のゲームを順に遊ばせ、集計を返す"""
+    profiler = Profiler(capacity=4096, enabled=True)
+    lengths = []
+    pieces = ticks = lines = pauses = 0
+    failures = []
+    start = perf_counter()
+    for index in indices:
+        seed = game_seed(base_seed, index)
+        board = SoakBoard(seed, mode, profiler)
+        try:
+            engine = play_game(board, max_pieces, check_every)
+        except Exception:
+            failure = {'index': index, 'seed': seed, 'traceback': traceback.format_exc()}
+            if failure_dir:
+                # 例外の直前までの操作を残す（replay.py でそのまま再生できる）
+                os.makedirs(failure_dir, exist_ok=True)
+                path = os.path.join(failure_dir, f'soak_{base_seed}_{index}.trpl')
+                board.recorder.finish().save(path)
+                failure['replay'] = path
+            failures.append(failure)
+            continue
+        lengths.append(engine.pieces)
+        pieces += engine.pieces
+        ticks += engine.ticks
+        lines += engine.lines
+        pauses += board.pauses
+    profiler.disable()
+    return {
+        'games': len(indices),
+        'pieces': pieces,
+        'ticks': ticks,
+        'lines': lines,
+        'pauses': pauses,
+        'elapsed': perf_counter() - start,
+        'lengths': lengths,
+        'latency_ns': {name: section.samples.values()
+                       for name, section in profiler.sections.items()},
+        'failures': failures,
+    }
+
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return {f'p{p}': 0 for p in points}
+    ordered = sorted(values)
+    return {f'p{p}': ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in points}
+
+
+def merge(results):
+    """シャードごとの集計を1つにまとめる"""
+    total = {'games': 0, 'pieces': 0, 'ticks': 0, 'lines': 0, 'pauses': 0, 'cpu_seconds': 0.0}
+    lengths = []
+    latency = {}
+    failures = []
+    for result in results:
+        for key in ('games', 'pieces', 'ticks', 'lines', 'pauses'):
+            total[key] += result[key]
+        total['cpu_seconds'] += result['elapsed']
+        lengths += result['lengths']
+        for name, samples in result['latency_ns'].items():
+            latency.setdefault(name, []).extend(samples)
+        failures += result['failures']
+    total['game_length_pieces'] = dict(percentiles(lengths, (10, 50, 90, 99)),
+                                       min=min(lengths, default=0), max=max(lengths, default=0))
+    total['latency_us'] = {name: {key: round(value / 1000, 2)
+                                  for key, value in percentiles(samples, (50, 90, 99, 100)).items()}
+                           for name, samples in latency.items()}
+    total['failures'] = failures
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1, help='基準シード')
+    parser.add_argument('--input', choices=('random', 'bot'), default='random')
+    parser.add_argument('--max-pieces', type=int, default=None, help='1ゲームのミノ数の上限')
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--check-every', type=int, default=60,
+                        help='何tickごとに整合性を確かめるか（0 で確かめない）')
+    parser.add_argument('--game', type=int, default=None, help='このゲーム番号だけを実行する')
+    parser.add_argument('--failures', default='soak_failures',
+                        help='失敗したゲームのリプレイを保存するディレクトリ')
+    parser.add_argument('--json', help='集計結果を書き出すパス')
+    args = parser.parse_args(argv)
+
+    if args.game is not None:
+        indices = [args.game]
+        shards = 1
+    else:
+        indices = list(range(args.games))
+        shards = max(1, min(args.shards, len(indices)))
+    # ゲーム番号を飛び飛びに配ると、長いゲームが1つのシャードに偏りにくい
+    chunks = [indices[i::shards] for i in range(shards)]
+
+    start = perf_counter()
+    if shards == 1:
+        results = [run_shard(args.seed, chunks[0], args.input, args.max_pieces,
+                             args.check_every, args.failures)]
+    else:
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            futures = [pool.submit(run_shard, args.seed, chunk, args.input, args.max_pieces,
+                                   args.check_every, args.failures) for chunk in chunks]
+            results = [future.result() for future in futures]
+    wall = perf_counter() - start
+    summary = merge(results)
+    summary['wall_seconds'] = round(wall, 3)
+    summary['pieces_per_second'] = round(summary['pieces'] / max(wall, 1e-9), 1)
+    summary['ticks_per_second'] = round(summary['ticks'] / max(wall, 1e-9), 1)
+
+    print(f"{summary['games']} games on {shards} shard(s) in {wall:.1f} s: "
+          f"{summary['pieces_per_second']:.0f} pieces/s, {summary['ticks_per_second']:.0f} ticks/s")
+    print(f"game length (pieces): {summary['game_length_pieces']}, "
+          f"{summary['pauses']} pause/resume cycles")
+    for name, stats in summary['latency_us'].items():
+        print(f"{name:<12} {stats} us")
+    for failure in summary['failures']:
+        print(f"FAILED game {failure['index']} (seed {failure['seed']}); "
+              f"rerun: python soak.py --seed {args.seed} --game {failure['index']} "
+              f"--input {args.input}")
+        print(failure['traceback'])
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
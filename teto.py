@@ -1,681 +1,156 @@
+from time import perf_counter
+
+_START_TIME = perf_counter()  # 起動時間の計測はここから（Kivy の読み込みを含む）
+
+import json
+import os
+import sys
+import threading
+
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.widget import Widget
-from kivy.graphics import Color, Rectangle
-from kivy.graphics import Line
 from kivy.clock import Clock
-from kivy.uix.floatlayout import FloatLayout
-from kivy.core.audio import SoundLoader
-import random
-import traceback
-
-class GameBoard(Widget):  # ゲームボードを表すクラス。KivyのWidgetを継承している。
-    def __init__(self, parent_ui=None, **kwargs):
-        super().__init__(**kwargs)  # 親クラス（Widget）の初期化を呼び出す
-        self.clearing_lines = []  # 揃って削除待ちの行番号
-        self.is_paused = False  # ← 一時停止フラグ
-        self.started = False    # すでにあるstart済みかチェック用
-        self.parent_ui = parent_ui  # 明示的にTetrisUIを受け取る
-        self.cols = 10  # 横方向のマスの数（テトリスなどでは通常10列）
-        self.rows = 20  # 縦方向のマスの数（テトリスの標準的な高さ）
-        self.cell_size = 0  # 各マスの大きさ（あとで計算される予定）
-        # ゲームボードのデータを2次元リストで表現（0 = 空、1など = ブロック）
-        self.board = [[0]*self.cols for _ in range(self.rows)]
-        # 現在落下中のブロック（ピース）をランダムに取得
-        self.current_piece = self.get_random_piece()
-        self._clock_event = None
-        self.update_event = None  # 後でキャンセルできるように
-        self.is_game_over = False
-        # 万一 __init__ 前にスケジュールされていたらキャンセルする
-        Clock.unschedule(self.update)
-        # ウィジェットのサイズまたは位置が変わったときに on_size を呼び出す
-        self.bind(size=self.on_size, pos=self.on_size)
-        self.score = 0
-        self.bgm = parent_ui.bgm  # ← 親のBGMを受け取る
-        if self.bgm:
-            self.bgm.loop = True  # ループ再生を有効にする
-            
-    def start(self):
-        print("▶️ start called")
-        self.started = True
-        if self.update_event:
-            self.update_event.cancel()
-        self.schedule_update()
-        if self.bgm:
-            self.bgm.play()  # ゲーム開始時にBGM再生
-
-    def stop(self):
-        print("⏹ stop called")
-        if self.bgm:
-            self.bgm.stop()
-        if self._clock_event:
-            self._clock_event.cancel()
-            self._clock_event = None
-            print("🛑 Clock cancelled")
-
-    def on_size(self, *args):
-        self.cell_size = min(self.width / self.cols, self.height / self.rows)
-        self.draw()
-
-    def get_random_piece(self):
-        pieces = [
-            {
-                'name': 'I',
-                'rotations': [
-                    [
-                        [0, 0, 0, 0],
-                        [1, 1, 1, 1],
-                        [0, 0, 0, 0],
-                        [0, 0, 0, 0],
-                    ],
-                    [
-                        [0, 0, 1, 0],
-                        [0, 0, 1, 0],
-                        [0, 0, 1, 0],
-                        [0, 0, 1, 0],
-                    ],
-                    [
-                        [0, 0, 0, 0],
-                        [0, 0, 0, 0],
-                        [1, 1, 1, 1],
-                        [0, 0, 0, 0],
-                    ],
-                    [
-                        [0, 1, 0, 0],
-                        [0, 1, 0, 0],
-                        [0, 1, 0, 0],
-                        [0, 1, 0, 0],
-                    ],
-                ],
-            },
-            {
-                'name': 'O',
-                'rotations': [
-                    [
-                        [1, 1],
-                        [1, 1],
-                    ],
-                ] * 4,
-            },
-            {
-                'name': 'T',
-                'rotations': [
-                    [
-                        [0, 1, 0],
-                        [1, 1, 1],
-                    ],
-                    [
-                        [1, 0],
-                        [1, 1],
-                        [1, 0],
-                    ],
-                    [
-                        [1, 1, 1],
-                        [0, 1, 0],
-                    ],
-                    [
-                        [0, 1],
-                        [1, 1],
-                        [0, 1],
-                    ],
-                ],
-            },
-            {
-                'name': 'S',
-                'rotations': [
-                    [
-                        [0, 1, 1],
-                        [1, 1, 0],
-                    ],
-                    [
-                        [1, 0],
-                        [1, 1],
-                        [0, 1],
-                    ],
-                    [
-                        [0, 1, 1],
-                        [1, 1, 0],
-                    ],
-                    [
-                        [1, 0],
-                        [1, 1],
-                        [0, 1],
-                    ],
-                ],
-            },
-            {
-                'name': 'Z',
-                'rotations': [
-                    [
-                        [1, 1, 0],
-                        [0, 1, 1],
-                    ],
-                    [
-                        [0, 1],
-                        [1, 1],
-                        [1, 0],
-                    ],
-                    [
-                        [1, 1, 0],
-                        [0, 1, 1],
-                    ],
-                    [
-                        [0, 1],
-                        [1, 1],
-                        [1, 0],
-                    ],
-                ],
-            },
-            {
-                'name': 'J',
-                'rotations': [
-                    [
-                        [1, 0, 0],
-                        [1, 1, 1],
-                    ],
-                    [
-                        [1, 1],
-                        [1, 0],
-                        [1, 0],
-                    ],
-                    [
-                        [1, 1, 1],
-                        [0, 0, 1],
-                    ],
-                    [
-                        [0, 1],
-                        [0, 1],
-                        [1, 1],
-                    ],
-                ],
-            },
-            {
-                'name': 'L',
-                'rotations': [
-                    [
-                        [0, 0, 1],
-                        [1, 1, 1],
-                    ],
-                    [
-                        [1, 0],
-                        [1, 0],
-                        [1, 1],
-                    ],
-                    [
-                        [1, 1, 1],
-                        [1, 0, 0],
-                    ],
-                    [
-                        [1, 1],
-                        [0, 1],
-                        [0, 1],
-                    ],
-                ],
-            },
-        ]
-
-        piece = random.choice(pieces)
-        piece['rotation'] = 0
-        piece['shape'] = piece['rotations'][0]
-
-        # 初期位置（X：中央に、Y：最上段）
-        piece_width = len(piece['shape'][0])
-        piece['position'] = (self.cols // 2 - piece_width // 2, 0)
-        return piece
-
-    def draw(self):
-        self.canvas.clear()
-        with self.canvas:
-            Color(1, 1, 1)
-            self.cell_size = min(self.width / self.cols, self.height / self.rows)
-
-            # 中央に配置するためのオフセットを計算
-            board_width = self.cell_size * self.cols
-            board_height = self.cell_size * self.rows
-            x0 = self.x + (self.width - board_width) / 2
-            y0 = self.y + (self.height - board_height) / 2
-
-            # グリッドの描画
-            Color(0.3, 0.3, 0.3)
-            for i in range(self.cols + 1):
-                Line(points=[x0 + i * self.cell_size, y0, x0 + i * self.cell_size, y0 + board_height])
-            for j in range(self.rows + 1):
-                Line(points=[x0, y0 + j * self.cell_size, x0 + board_width, y0 + j * self.cell_size])
-
-            # 固定されたブロックの描画ループ内
-            for y in range(self.rows):
-                for x in range(self.cols):
-                    if self.board[y][x]:
-                        if y in self.clearing_lines:
-                            Color(1, 1, 0)  # ライン消去前のハイライト色
-                        else:
-                            Color(0.6, 0.6, 0.9)
-                        Rectangle(
-                            pos=(x0 + x * self.cell_size, y0 + (self.rows - y - 1) * self.cell_size),
-                            size=(self.cell_size, self.cell_size)
-                        )
-            # 現在のミノ
-            piece = self.current_piece
-            shape = piece['rotations'][piece['rotation']]
-            Color(0.8, 0.4, 0.4)
-            px_base, py_base = piece['position']  # ここで展開
-            for dy, row in enumerate(shape):
-                for dx, cell in enumerate(row):
-                    if cell:
-                        px = x0 + (px_base + dx) * self.cell_size
-                        py = y0 + (self.rows - (py_base + dy) - 1) * self.cell_size
-                        Rectangle(pos=(px, py), size=(self.cell_size, self.cell_size))
-
-    def check_collision(self, x, y, shape):
-        for sy, row in enumerate(shape):
-            for sx, cell in enumerate(row):
-                if cell:
-                    new_x = x + sx
-                    new_y = y + sy
-                    if (new_x < 0 or new_x >= self.cols or
-                        new_y >= self.rows or
-                        (new_y >= 0 and self.board[new_y][new_x])):
-                        return True
-        return False
-
-    def move_piece(self, dx):
-        x, y = self.current_piece['position']  # 位置を取得
-        if self.can_move(dx, 0):
-            self.current_piece['position'] = (x + dx, y)  # 更新
-            self.draw()
-
-    def rotate_piece(self, left=False):
-        piece = self.current_piece
-        old_rotation = piece['rotation']
-        num_rotations = len(piece['rotations'])
-        x, y = piece['position']
-
-        # 回転インデックス更新
-        if left:
-            new_rotation = (old_rotation - 1) % num_rotations
-        else:
-            new_rotation = (old_rotation + 1) % num_rotations
-
-        # 新しい形状を仮に適用
-        piece['rotation'] = new_rotation
-        piece['shape'] = piece['rotations'][new_rotation]
-
-        # ミノの種類による回転補正（SRS風）
-        if piece.get('name') == 'I':
-            offsets = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)]
-        else:
-            offsets = [(0, 0)]
-
-        placed = False
-        for dx, dy in offsets:
-            piece['position'] = (x + dx, y + dy)
-            if self.can_move(0, 0):  # この位置に置けるか
-                placed = True
-                break
-
-        # すべて失敗 → 回転を元に戻す
-        if not placed:
-            piece['rotation'] = old_rotation
-            piece['shape'] = piece['rotations'][old_rotation]
-            piece['position'] = (x, y)
-
-    def can_move(self, dx, dy, rotation_offset=0):
-        piece = self.current_piece
-        new_rotation = (piece['rotation'] + rotation_offset) % len(piece['rotations'])
-        shape = piece['rotations'][new_rotation]
-
-        px, py = piece['position']  # ← ここで位置を取得
-
-        for y, row in enumerate(shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    new_x = px + x + dx
-                    new_y = py + y + dy
-                    if (new_x < 0 or new_x >= self.cols or
-                        new_y >= self.rows or
-                        (new_y >= 0 and self.board[new_y][new_x])):
-                        return False
-        return True
+from kivy.core.window import Window
+from log import get_logger, install_crash_dump
 
-    def move_left(self):
-        if self.can_move(-1, 0):
-            self.current_piece['x'] -= 1
-            self.draw()
-
-    def move_right(self):
-        if self.can_move(1, 0):
-            self.current_piece['x'] += 1
-            self.draw()
-
-    def rotate_right(self):
-        if self.can_move(0, 0, 1):
-            self.current_piece['rotation'] = (self.current_piece['rotation'] + 1) % 4
-            self.draw()
-
-    def rotate_left(self):
-        if self.can_move(0, 0, -1):
-            self.current_piece['rotation'] = (self.current_piece['rotation'] - 1) % 4
-            self.draw()  
-
-    def lock_piece(self):
-        x, y = self.current_piece['position']
-        shape = self.current_piece['rotations'][self.current_piece['rotation']]
-
-        # 現在のピースをボードに固定
-        for dy, row in enumerate(shape):
-            for dx, cell in enumerate(row):
-                if cell:
-                    bx = x + dx
-                    by = y + dy
-                    if 0 <= by < self.rows and 0 <= bx < self.cols:
-                        self.board[by][bx] = 1
-
-        # ラインが揃っていれば消す
-        self.clear_lines()
-
-        # 新しいピースを出す
-        self.current_piece = self.get_random_piece()
-
-        # 新しいピースが置けなければゲームオーバー（optional）
-        if not self.can_move(0, 0):
-            self.game_over()
-
-    def clear_lines(self):
-        full_lines = [i for i, row in enumerate(self.board) if all(cell != 0 for cell in row)]
-        if not full_lines:
-            return
+screen_log = get_logger('screen')
+startup_log = get_logger('startup')
 
-        print(f"💥 Cleared {len(full_lines)} line(s), pausing update")
-        self.is_paused = True
-        self.clearing_lines = full_lines[:]  # ← 揃った行を保存
+# タイトル表示後に裏で読み込んでおく、Kivy に依存しないモジュール
+PREWARM_MODULES = ('tetromino', 'bitboard', 'rotation', 'randomizer', 'engine',
+                   'replay', 'snapshot', 'gameloop', 'perf', 'bot')
+# プレイ途中のゲームの保存先（user_data_dir の中）
+SNAPSHOT_FILE = 'snapshot.tsnp'
 
-        if self.update_event:
-            self.update_event.cancel()
-            self.update_event = None
 
-        if self.parent_ui and self.parent_ui.line_clear_se:
-            self.parent_ui.line_clear_se.play()
-
-        self.score += len(full_lines)
-        if self.parent_ui:
-            self.parent_ui.update_score(self.score)
-
-        Clock.schedule_once(lambda dt: self.finish_clear_lines(), 0.5)
-
-    def update(self, dt):
-        print(f"🌀 update: started={self.started}, paused={self.is_paused}")
-        if self.is_paused:
-            print("🛑 update skipped due to pause")
-            return
-        if not self.started or self.is_paused:
-            return  # ← 停止中は何もしない
-        if self.is_game_over:
-            print("⛔ update stopped: game over")
-            return
+class TetrisApp(App):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.startup_times = {}  # 起動の各段階までの経過ミリ秒
+        self._paused_game = False  # on_pause でゲームを止めたか
 
-        x, y = self.current_piece['position']
-        
-        # 下に動かせるなら1マス落とす
-        if self.can_move(0, 1):
-            self.current_piece['position'] = (x, y + 1)
-        else:
-            # 動かせないので固定する
-            self.lock_piece()
-
-            # 💡 lock後にゲームオーバーを判定
-            if self.detect_game_over():
-                self.game_over()  # ここで止めて親に通知
-
-        # 毎フレーム描画更新
-        self.draw()
-
-    def detect_game_over(self):
-        # 最上段にブロックが積もったかを判定
-        return any(cell != 0 for cell in self.board[0])
-
-    def game_over(self):
-        print("Game Over")
-        self.is_game_over = True
-        if self.update_event:
-            self.update_event.cancel()
-            self.update_event = None
-        self.stop()
-        if self.parent_ui and hasattr(self.parent_ui, 'show_game_over'):
-            print("Calling parent's show_game_over()")
-            self.parent_ui.show_game_over()
-        else:
-            print("⚠️ No show_game_over method in parent_ui")
-            print(self.parent)
-
-    def hard_drop(self): 
-        while self.can_move(0, 1):
-            x, y = self.current_piece['position']
-            self.current_piece['position'] = (x, y + 1)
-        self.lock_piece()
-        self.draw()
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.user_data_dir, SNAPSHOT_FILE)
 
-    def reset(self):
-        print("🧹 Resetting GameBoard...")
-
-        # ボードをクリア
-        self.board = [[0]*self.cols for _ in range(self.rows)]
-
-        # 落下中のブロックを新しくする
-        self.current_piece = self.get_random_piece()
-
-        # フラグを初期化
-        self.is_game_over = False
-
-        # 既存の描画をすべて削除（必要なら）
-        self.clear_widgets()
-
-        # タイマーをリセット
-        self._clock_event = None
-        self.score = 0
-
-    def resume_game(self, dt):
-        print("▶️ Resuming game after pause")
-        self.is_paused = False
-        self.schedule_update()
-
-    def schedule_update(self):
-        if self.update_event:
-            print("🔁 Cancelling previous update_event")
-            self.update_event.cancel()  # ← 必ずキャンセルしてから
-        else:
-            print("▶️ No previous update_event to cancel")
-        print("⏰ Scheduling new update_event")
-        self.update_event = Clock.schedule_interval(self.update, 0.5)
-
-    def stop_update(self):
-        if self.update_event:
-            self.update_event.cancel()
-            self.update_event = None
-
-    def check_lines(self):
-        lines_to_clear = self.get_full_lines()
-        if lines_to_clear:
-            self.clear_lines(lines_to_clear)
-            self.pause_after_clear()
-
-    def pause_after_clear(self):
-        print("🛑 Pausing after line clear")
-        self.is_paused = True
-        Clock.schedule_once(self.resume_game, 0.3)  # ← 0.3秒後に再開
-
-    def _delete_lines_after_pause(self, dt):
-        # ライン消去＆ボード再構築
-        new_board = [row for row in self.board if any(cell == 0 for cell in row)]
-        lines_cleared = self.rows - len(new_board)
-        for _ in range(lines_cleared):
-            new_board.insert(0, [0 for _ in range(self.cols)])
-        self.board = new_board
-
-        # 一時停止解除＆更新再開
-        self.is_paused = False
-        self.schedule_update()
-
-    def finish_clear_lines(self):
-        print("🧹 Removing lines after pause")
-
-        for i in sorted(self.clearing_lines):
-            del self.board[i]
-            self.board.insert(0, [0 for _ in range(self.cols)])
-
-        self.clearing_lines = []  # ← 忘れずにクリア
-        self.is_paused = False
-        self.schedule_update()
-        print("▶️ Resuming game after line clear")
-
-    def pause_game(self):
-        print("⏸ Game paused")
-        self.is_paused = True
-        if self.update_event:
-            self.update_event.cancel()
-            self.update_event = None
-
-class TetrisUI(FloatLayout):  # Tetrisアプリ全体のUIを構成するクラス。BoxLayoutを継承。
-    def __init__(self, screen_manager=None, **kwargs):
-        super().__init__(**kwargs)
-        self.screen_manager = screen_manager
-        self._clock_event = None
-
-        # ゲームボード作成前にBGMを読み込む
-        self.bgm = SoundLoader.load('assets\game_bgm.ogg')
-        if self.bgm:
-            self.bgm.loop = True
-        else:
-            print("⚠️ BGMファイルが読み込めませんでした")
-        # 効果音ロード（ファイルがある場所を確認）
-        self.line_clear_se = SoundLoader.load('assets/line_clear.wav')
-
-        main_layout = BoxLayout(orientation='horizontal', size_hint=(1, 1))
-
-        self.game_board = GameBoard(parent_ui=self)
-
-        # 左コントロール
-        left_controls = BoxLayout(orientation='vertical', size_hint=(0.2, 1))
-        left_move_btn = Button(text='L Move')
-        left_rotate_btn = Button(text='L Rotate')
-        # スコア表示用ラベル
-        self.score_label = Label(text='Score: 0', font_size='20sp', size_hint=(1, 0.2),
-                         halign='center', valign='middle')
-        self.score_label.bind(size=self.score_label.setter('text_size'))  # テキストを中央に揃える
-        left_move_btn.bind(on_press=lambda instance: self.game_board.move_piece(-1))
-        left_rotate_btn.bind(on_press=lambda instance: self.game_board.rotate_piece(left=True))
-        left_controls.add_widget(left_move_btn)
-        left_controls.add_widget(left_rotate_btn)
-        left_controls.add_widget(Widget())  # 空白で真ん中調整
-        left_controls.add_widget(self.score_label)
-
-        # 中央ゲームエリア
-        center_area = BoxLayout(size_hint=(0.6, 1))
-        center_area.add_widget(self.game_board)
-        self.game_board.size_hint = (1, 1)
-
-        # 右コントロール
-        right_controls = BoxLayout(orientation='vertical', size_hint=(0.2, 1))
-        right_move_btn = Button(text='R Move')
-        right_rotate_btn = Button(text='R Rotate')
-        hard_drop_btn = Button(text='Hard Drop')
-        right_move_btn.bind(on_press=lambda instance: self.game_board.move_piece(1))
-        right_rotate_btn.bind(on_press=lambda instance: self.game_board.rotate_piece(left=False))
-        hard_drop_btn.bind(on_press=lambda instance: self.game_board.hard_drop())
-        right_controls.add_widget(right_move_btn)
-        right_controls.add_widget(right_rotate_btn)
-        right_controls.add_widget(hard_drop_btn)
-
-        main_layout.add_widget(left_controls)
-        main_layout.add_widget(center_area)
-        main_layout.add_widget(right_controls)
-
-        self.add_widget(main_layout)
-
-        # オーバーレイは最前面に表示
-        self.overlay = FloatLayout()
-        self.overlay_label = Label(text='GAME OVER', font_size='40sp',
-                                   size_hint=(None, None), size=(400, 100),
-                                   pos_hint={'center_x': 0.5, 'center_y': 0.7})
-        continue_btn = Button(text='Continue', size_hint=(0.3, 0.1),
-                              pos_hint={'center_x': 0.5, 'center_y': 0.5})
-        title_btn = Button(text='Back to Title', size_hint=(0.3, 0.1),
-                           pos_hint={'center_x': 0.5, 'center_y': 0.35})
-        continue_btn.bind(on_press=self.continue_game)
-        title_btn.bind(on_press=self.back_to_title)
-        self.overlay.add_widget(self.overlay_label)
-        self.overlay.add_widget(continue_btn)
-        self.overlay.add_widget(title_btn)
-        self.overlay.opacity = 0
-        self.add_widget(self.overlay)
-
-    def show_game_over(self):
-        self.overlay.opacity = 1  # ゲームオーバー表示
-
-    def continue_game(self, instance):
-        self.overlay.opacity = 0
-        self.game_board.reset()
-        # updateのキャンセルはここだけでOK
-        self.cancel_update()   
-        self.game_board.start()  # start()の中でschedule_update()を呼ぶのでここで再度呼ばなくてOK
-        self.update_score(0)
-
-    def back_to_title(self, instance):
-        self.cancel_update()
-        if self._clock_event:
-            self._clock_event.cancel()
-            self._clock_event = None
-        if self.game_board.bgm:
-            self.game_board.bgm.stop()
-        self.overlay.opacity = 0
-        if self.screen_manager:
-            self.screen_manager.current = 'title'
-
-    def schedule_update(self):
-        if not self._clock_event:
-            self._clock_event = Clock.schedule_interval(self.update, 0.5)
-
-    def update(self, dt):
-        self.game_board.update(dt)  # GameBoardのupdateを呼ぶ
-
-    def cancel_update(self):
-        if self._clock_event:
-            self._clock_event.cancel()
-            self._clock_event = None
-
-    def update_score(self, new_score):
-        self.score_label.text = f"Score: {new_score}"
+    def mark(self, name):
+        """起動開始からの経過時間を記録する"""
+        self.startup_times[name] = round((perf_counter() - _START_TIME) * 1000, 1)
 
-class TetrisApp(App):
     def build(self):
+        self.mark('build')
+        # クラッシュ時に直近のログを書き出す
+        install_crash_dump(os.path.join(self.user_data_dir, 'crash_log.txt'))
         sm = MyScreenManager()  # 独自のScreenManagerで画面遷移を管理
-        sm.add_widget(TitleScreen(name='title'))  # 最初の画面を追加
-        sm.add_widget(GameScreen(name='game'))  # ← ゲーム画面も追加
+        title = TitleScreen(name='title')
+        sm.add_widget(title)  # 最初の画面だけ作る（ゲーム画面は後で）
         sm.current = 'title'  # 初期表示を設定
+        title.update_continue()  # 前回の途中のゲームがあれば「Continue」を出す
+        # タイトルが最初に描かれたら、ゲーム画面を先読みする
+        Window.bind(on_flip=self.on_first_frame)
         return sm
 
-# ゲーム画面
+    def on_first_frame(self, *args):
+        Window.unbind(on_flip=self.on_first_frame)
+        self.mark('first_frame')
+        startup_log.info("first frame: %.1f ms", self.startup_times['first_frame'])
+        threading.Thread(target=self._prewarm_modules, name='prewarm', daemon=True).start()
+
+    def _prewarm_modules(self):
+        # Kivy に触れないモジュールだけを裏のスレッドで読み込む（テーブルの前計算も含む）
+        for name in PREWARM_MODULES:
+            __import__(name)
+        Clock.schedule_once(self.prewarm_game_screen)
+
+    def prewarm_game_screen(self, dt=None):
+        """ゲーム画面を組み立てておく（まだ遷移していなければ）"""
+        self.root.game_screen.ensure_ui()
+        self.mark('game_ready')
+        self.save_startup_times()
+
+    def _tetris_ui(self):
+        # 作成済みの TetrisUI（ゲーム画面を作らせないよう has_screen で確かめる）
+        sm = self.root
+        if sm and sm.has_screen('game'):
+            return sm.get_screen('game').tetris_ui
+        return None
+
+    def _playing_ui(self):
+        # ゲーム画面を表示中なら TetrisUI
+        if self.root and self.root.current == 'game':
+            return self._tetris_ui()
+        return None
+
+    def on_pause(self):
+        # Android で裏に回ったとき。プロセスごと終了されても続きから遊べるよう保存する
+        ui = self._playing_ui()
+        if ui and ui.save_snapshot():
+            ui.game_board.pause_game()
+            self._paused_game = True
+        # 裏に回っている間は BGM・効果音も止める
+        ui = self._tetris_ui()
+        if ui:
+            ui.audio.pause()
+        return True
+
+    def on_resume(self):
+        # プロセスが残っていれば盤面はメモリにあるので、止めた tick を再開するだけ
+        ui = self._tetris_ui()
+        if ui:
+            ui.audio.resume()
+        ui = self._playing_ui()
+        if ui and self._paused_game:
+            ui.game_board.resume_game()
+        self._paused_game = False
+
+    def on_stop(self):
+        ui = self._playing_ui()
+        if ui:
+            ui.save_snapshot()
+        if 'snapshot' in sys.modules:
+            sys.modules['snapshot'].flush()  # 終了前に書き込みを終わらせる
+
+    def save_startup_times(self):
+        # 実機での推移を追えるよう、起動ごとに1行ずつ追記する
+        startup_log.info("startup: %s", self.startup_times)
+        try:
+            with open(os.path.join(self.user_data_dir, 'startup_times.jsonl'), 'a',
+                      encoding='utf-8') as f:
+                f.write(json.dumps(self.startup_times) + '\n')
+        except OSError:
+            startup_log.warning("could not write startup times")
+
+# ゲーム画面（中身の TetrisUI は最初に必要になったときに作る）
 class GameScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        print("🟠 GameScreen.__init__ called")
-        self.tetris_ui = TetrisUI()  # 一旦 screen_manager なしで初期化
-        self.add_widget(self.tetris_ui)
-        self.bgm = None  # ← BGMを保持する変数
+        screen_log.debug("GameScreen.__init__ called")
+        self.tetris_ui = None
+
+    def ensure_ui(self):
+        """TetrisUI を作って返す（2回目以降は作らない）"""
+        if self.tetris_ui is None:
+            from game_ui import TetrisUI
+            self.tetris_ui = TetrisUI(screen_manager=self.manager)
+            self.add_widget(self.tetris_ui)
+        return self.tetris_ui
+
+    def on_pre_enter(self):
+        self.ensure_ui()
 
     def on_enter(self):
-        print("🔶 GameScreen.on_enter called")
-        print("🔷 calling game_board.start() in on_enter")
+        screen_log.debug("GameScreen.on_enter called")
         # 画面遷移時に screen_manager を改めて設定（managerが使えるようになる）
         self.tetris_ui.screen_manager = self.manager  # 遷移後に設定
 
     def reset(self):
-        print("🧹 GameScreen.reset() called")
-        if self.tetris_ui and self.tetris_ui.game_board:
-            self.tetris_ui.game_board.reset()
-            self.tetris_ui.game_board.start()  # 明示的にここで開始する
+        screen_log.debug("GameScreen.reset() called")
+        tetris_ui = self.ensure_ui()
+        tetris_ui.game_board.reset()
+        tetris_ui.game_board.start()  # 明示的にここで開始する
 
 # タイトル画面
 class TitleScreen(Screen):
@@ -689,16 +164,36 @@ class TitleScreen(Screen):
         # スタートボタン
         start_button = Button(text='Start Game', size_hint=(1, 0.2))
         start_button.bind(on_press=self.start_game)
+        # 途中で抜けたゲームの続き（保存がなければ押せない）
+        self.continue_button = Button(text='Continue', size_hint=(1, 0.1), disabled=True)
+        self.continue_button.bind(on_press=self.continue_game)
+        # ボットが遊ぶデモ
+        demo_button = Button(text='Demo', size_hint=(1, 0.1))
+        demo_button.bind(on_press=self.start_demo)
 
         layout.add_widget(title_label)
         layout.add_widget(start_button)
+        layout.add_widget(self.continue_button)
+        layout.add_widget(demo_button)
 
         self.add_widget(layout)
 
     def start_game(self, *args):  # Buttonから呼ばれるときに引数が来るため
-        print("🟡 TitleScreen.start_game() called")
+        screen_log.debug("TitleScreen.start_game() called")
         self.manager.start_game()  # 親のScreenManagerに処理を任せる
 
+    def start_demo(self, *args):
+        self.manager.start_demo()
+
+    def continue_game(self, *args):
+        self.manager.continue_game()
+
+    def update_continue(self):
+        self.continue_button.disabled = not (self.manager and self.manager.can_continue())
+
+    def on_pre_enter(self):
+        self.update_continue()
+
 # 画面遷移を管理
 class TetrisRoot(ScreenManager):
     def __init__(self, **kwargs):
@@ -707,28 +202,66 @@ class TetrisRoot(ScreenManager):
         self.current = 'title'
         
     def start_game(self):
-        print("🟢 TetrisRoot.start_game() called")
+        screen_log.debug("TetrisRoot.start_game() called")
         if not self.has_screen('game'):
             self.add_widget(GameScreen(name='game'))
         self.current = 'game'
 
         # GameScreen 内の game_board を start
         game_screen = self.get_screen('game')
-        print(f"🔵 game_screen: {game_screen}")
-        print(f"🔵 tetris_ui: {getattr(game_screen, 'tetris_ui', None)}")
-        print(f"🔵 game_board: {getattr(getattr(game_screen, 'tetris_ui', None), 'game_board', None)}")
-        game_screen.tetris_ui.game_board.start()
+        screen_log.debug("game_screen: %r", game_screen)
+        game_screen.ensure_ui().game_board.start()
 
 class MyScreenManager(ScreenManager):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.game_screen = GameScreen(name='game')
-        self.add_widget(self.game_screen)
+    @property
+    def game_screen(self):
+        """ゲーム画面（最初に参照されたときに追加する）"""
+        if not self.has_screen('game'):
+            self.add_widget(GameScreen(name='game'))
+        return self.get_screen('game')
 
     def start_game(self):
-        print("🟡 TitleScreen.start_game() called")
+        screen_log.debug("TitleScreen.start_game() called")
         self.game_screen.reset()  # リセット処理があればここで呼ぶ
+        self.game_screen.tetris_ui.discard_snapshot()  # 新しいゲームを始めたら前の続きは消す
+        self.current = 'game'
+
+    def _saved_tetris_ui(self):
+        if self.has_screen('game'):
+            return self.get_screen('game').tetris_ui
+        return None
+
+    def can_continue(self):
+        """続きから遊べるゲームが保存されているか"""
+        ui = self._saved_tetris_ui()
+        if ui and ui.saved_snapshot:
+            return True
+        app = App.get_running_app()
+        return bool(app) and os.path.exists(app.snapshot_path)
+
+    def continue_game(self):
+        """保存したゲームの続きを始める（同じプロセス内ならメモリから、なければファイルから）"""
+        ui = self.game_screen.ensure_ui()
+        data = ui.saved_snapshot
+        if data is None:
+            from snapshot import load
+            app = App.get_running_app()
+            data = load(app.snapshot_path) if app else None
+        try:
+            resumed = data is not None and ui.resume_snapshot(data)
+        except (ValueError, IndexError):
+            screen_log.warning("saved game could not be restored")
+            ui.discard_snapshot()
+            resumed = False
+        if not resumed:
+            self.start_game()
+            return
+        self.current = 'game'
+
+    def start_demo(self):
+        screen_log.debug("MyScreenManager.start_demo() called")
+        self.game_screen.ensure_ui().game_board.start_demo()
         self.current = 'game'
 
 if __name__ == '__main__':
-    TetrisApp().run()
\ No newline at end of file
+    TetrisApp().run()
@@ -0,0 +1,181 @@
+"""テトロミノの定義（インポート時に一度だけ組み立てる不変カタログ）
+
+形状はタプルで持ち、回転ごとのセル座標・外接矩形・行マスクも
+前計算しておく。ミノ出現時に作るのは ActivePiece だけ。
+"""
+from collections import namedtuple
+
+from bitboard import shape_to_masks
+
+# 各ミノの回転形状（'#' = ブロック）。SRS の回転状態 0, R, 2, L の順で、
+# 回転中心が変わらないよう J/L/S/T/Z は 3x3、I は 4x4 の枠で持つ
+_SHAPES = (
+    ('I', (
+        ('....',
+         '####',
+         '....',
+         '....'),
+        ('..#.',
+         '..#.',
+         '..#.',
+         '..#.'),
+        ('....',
+         '....',
+         '####',
+         '....'),
+        ('.#..',
+         '.#..',
+         '.#..',
+         '.#..'),
+    )),
+    ('O', (
+        ('##',
+         '##'),
+    ) * 4),
+    ('T', (
+        ('.#.',
+         '###',
+         '...'),
+        ('.#.',
+         '.##',
+         '.#.'),
+        ('...',
+         '###',
+         '.#.'),
+        ('.#.',
+         '##.',
+         '.#.'),
+    )),
+    ('S', (
+        ('.##',
+         '##.',
+         '...'),
+        ('.#.',
+         '.##',
+         '..#'),
+        ('...',
+         '.##',
+         '##.'),
+        ('#..',
+         '##.',
+         '.#.'),
+    )),
+    ('Z', (
+        ('##.',
+         '.##',
+         '...'),
+        ('..#',
+         '.##',
+         '.#.'),
+        ('...',
+         '##.',
+         '.##'),
+        ('.#.',
+         '##.',
+         '#..'),
+    )),
+    ('J', (
+        ('#..',
+         '###',
+         '...'),
+        ('.##',
+         '.#.',
+         '.#.'),
+        ('...',
+         '###',
+         '..#'),
+        ('.#.',
+         '.#.',
+         '##.'),
+    )),
+    ('L', (
+        ('..#',
+         '###',
+         '...'),
+        ('.#.',
+         '.#.',
+         '.##'),
+        ('...',
+         '###',
+         '#..'),
+        ('##.',
+         '.#.',
+         '.#.'),
+    )),
+)
+
+# name: ミノ名, index: カタログ内の番号
+# shapes[r]: 0/1 のタプル形状, cells[r]: (dx, dy) のタプル
+# bboxes[r]: セルの外接矩形 (left, top, right, bottom)
+# masks[r]: BitBoard 用の (行マスク, 左端列, 右端列)
+# bottoms[r]: 列ごとの最下段セル (dx, dy)（着地位置の計算用）
+PieceType = namedtuple('PieceType', 'name index shapes cells bboxes masks bottoms')
+
+
+def _build(index, name, rotations):
+    shapes = []
+    cells = []
+    bboxes = []
+    masks = []
+    bottoms = []
+    for rows in rotations:
+        shape = tuple(tuple(1 if c == '#' else 0 for c in row) for row in rows)
+        offsets = tuple((dx, dy) for dy, row in enumerate(shape)
+                        for dx, cell in enumerate(row) if cell)
+        xs = [dx for dx, _ in offsets]
+        ys = [dy for _, dy in offsets]
+        shapes.append(shape)
+        cells.append(offsets)
+        bboxes.append((min(xs), min(ys), max(xs), max(ys)))
+        masks.append(shape_to_masks(shape))
+        lowest = {}
+        for dx, dy in offsets:
+            lowest[dx] = max(lowest.get(dx, dy), dy)
+        bottoms.append(tuple(sorted(lowest.items())))
+    return PieceType(name, index, tuple(shapes), tuple(cells),
+                     tuple(bboxes), tuple(masks), tuple(bottoms))
+
+
+PIECES = tuple(_build(i, name, rotations) for i, (name, rotations) in enumerate(_SHAPES))
+PIECES_BY_NAME = {piece.name: piece for piece in PIECES}
+
+
+class ActivePiece:
+    """落下中のミノの状態（種類・回転・位置だけを持つ）"""
+    __slots__ = ('kind', 'rotation', 'x', 'y')
+
+    def __init__(self, kind, rotation=0, x=0, y=0):
+        self.kind = kind
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+
+    @property
+    def name(self):
+        return self.kind.name
+
+    @property
+    def shape(self):
+        return self.kind.shapes[self.rotation]
+
+    @property
+    def cells(self):
+        return self.kind.cells[self.rotation]
+
+    @property
+    def masks(self):
+        return self.kind.masks[self.rotation]
+
+    @property
+    def bottoms(self):
+        return self.kind.bottoms[self.rotation]
+
+    @property
+    def position(self):
+        return (self.x, self.y)
+
+
+def spawn(kind, cols):
+    """初期位置（X：中央に、Y：最上段）にミノを出す"""
+    width = len(kind.shapes[0][0])
+    return ActivePiece(kind, 0, cols // 2 - width // 2, 0)